@@ -1,20 +1,33 @@
-import random
 import time
 import csv
+from functools import partial
 import networkx as nx
+import numpy as np
+from escalation import ESCALATION_PATTERNS, PatternAutomaton, batched_role_chain_escalation, role_chain_cache
+from evaluation_cache import CACHE_HEADER, measure_with_cache
+from incremental import IncrementalABACDetector
+from profiling import profile_session
+from snapshot import load_or_generate
+from sweep import load_row_configuration, make_rng, write_sweep
+from timing import TIMING_HEADER, PhaseTimer
 
 traversal_count = 0
 
+ALL_PERMISSIONS = [
+    'iam:PassRole', 'ec2:RunInstances', 's3:PutObject',
+    'iam:AttachRolePolicy', 'iam:UpdateRole', 'iam:UpdateAssumeRolePolicy'
+]
+PERMISSION_BITS = {permission: 1 << bit for bit, permission in enumerate(ALL_PERMISSIONS)}
+RESOURCE_TYPES = ['EC2Instance', 'S3Bucket', 'IAMRole']
+RESOURCE_TYPE_CODES = {res_type: code for code, res_type in enumerate(RESOURCE_TYPES)}
 
-def generate_abac_model(num_users, num_roles, num_resources):
-    all_permissions = [
-        'iam:PassRole', 'ec2:RunInstances', 's3:PutObject',
-        'iam:AttachRolePolicy', 'iam:UpdateRole', 'iam:UpdateAssumeRolePolicy'
-    ]
 
-    users = {f"User_{i}": {'JobTitle': random.choice(['Developer', 'DataEngineer', 'SecurityAdmin'])} for i in range(num_users)}
-    roles = {f"Role_{i}": {'Permissions': random.choices(all_permissions, k=random.randint(1, len(all_permissions)))} for i in range(num_roles)}
-    resources = {f"Resource_{i}": random.choice(['EC2Instance', 'S3Bucket', 'IAMRole']) for i in range(num_resources)}
+def generate_abac_model(num_users, num_roles, num_resources, rng=None):
+    rng = make_rng(rng)
+
+    users = {f"User_{i}": {'JobTitle': rng.choice(['Developer', 'DataEngineer', 'SecurityAdmin'])} for i in range(num_users)}
+    roles = {f"Role_{i}": {'Permissions': rng.choices(ALL_PERMISSIONS, k=rng.randint(1, len(ALL_PERMISSIONS)))} for i in range(num_roles)}
+    resources = {f"Resource_{i}": rng.choice(RESOURCE_TYPES) for i in range(num_resources)}
     policies = {}
 
     G = nx.DiGraph()
@@ -29,7 +42,7 @@ def generate_abac_model(num_users, num_roles, num_resources):
 
     # Generate user-role associations
     for user, attributes in users.items():
-        policies[user] = random.sample(list(roles.keys()), random.randint(1, 3))
+        policies[user] = rng.sample(list(roles.keys()), rng.randint(1, 3))
         for role in policies[user]:
             G.add_edge(user, role)
 
@@ -45,6 +58,28 @@ def build_abac_graph(G, roles, resources):
 
     return G
 
+def build_abac_graph_batched(G, roles, resources):
+    # Same edges as build_abac_graph, from role permission bitmasks and resource
+    # type codes combined with boolean outer products and one bulk insert
+    role_names = list(roles)
+    resource_names = list(resources)
+
+    role_masks = np.array([sum(PERMISSION_BITS[p] for p in set(roles[role]['Permissions'])) for role in role_names],
+                          dtype=np.uint8)
+    resource_codes = np.array([RESOURCE_TYPE_CODES[resources[resource]] for resource in resource_names], dtype=np.uint8)
+
+    can_run = (role_masks & PERMISSION_BITS['ec2:RunInstances']) != 0
+    can_pass = (role_masks & PERMISSION_BITS['iam:PassRole']) != 0
+    is_ec2 = resource_codes == RESOURCE_TYPE_CODES['EC2Instance']
+    is_iam_role = resource_codes == RESOURCE_TYPE_CODES['IAMRole']
+
+    matches = np.outer(can_run, is_ec2) | np.outer(can_pass, is_iam_role)
+    role_idx, resource_idx = np.nonzero(matches)
+
+    G.add_edges_from(zip([role_names[i] for i in role_idx.tolist()], [resource_names[j] for j in resource_idx.tolist()]))
+
+    return G
+
 def detect_privilege_escalation(G):
     global traversal_count
     traversal_count = 0
@@ -66,35 +101,157 @@ def detect_privilege_escalation(G):
 
     return escalation_paths, traversal_count
 
-def run_privilege_escalation_simulation(log_ranges, repetitions=10):
-    results = []
+def detect_privilege_escalation_batched(G):
+    # Same paths and traversal count as detect_privilege_escalation, with each role's
+    # PassRole -> IAMRole -> RunInstances chain evaluated once instead of once per user
+    global traversal_count
+    escalation_paths, traversal_count = batched_role_chain_escalation(G)
+    return escalation_paths, traversal_count
+
+def detect_privilege_escalation_cached(G, cache=None):
+    # detect_privilege_escalation_batched with each role's chain evaluated the first
+    # time a user reaches it and served from the cache after that
+    global traversal_count
+    if cache is None:
+        cache = role_chain_cache(G)
+
+    escalation_paths, traversal_count = batched_role_chain_escalation(G, cache)
+    return escalation_paths, traversal_count
+
+def detect_escalation_patterns(G, automaton=None):
+    # Every pattern of the escalation catalogue in one traversal, mapping each flagged
+    # user to {pattern: path} for the patterns it matches
+    global traversal_count
+    if automaton is None:
+        automaton = PatternAutomaton(ESCALATION_PATTERNS)
+
+    matches, traversal_count = automaton.match(G)
+    escalation_paths = {}
+    for name, paths in matches.items():
+        for user, path in paths.items():
+            escalation_paths.setdefault(user, {})[name] = path
+
+    return escalation_paths, traversal_count
+
+def generate_policy_graph(num_users, num_roles, num_resources, batched=False, seed=None):
+    users, roles, resources, policies, G = generate_abac_model(num_users, num_roles, num_resources, rng=seed)
+    if batched:
+        G = build_abac_graph_batched(G, roles, resources)
+    else:
+        G = build_abac_graph(G, roles, resources)
+
+    model = {'users': users, 'roles': roles, 'resources': resources, 'policies': policies}
+    return model, G
 
-    for _ in range(repetitions):
-        for num_users, num_roles, num_resources in log_ranges:
+def run_configuration(num_users, num_roles, num_resources, batched=False, detector='nested', seed=None, snapshot_dir=None,
+                      runs=1, trace_memory=False, profile=None):
+    timer = PhaseTimer(runs, trace_memory, profile_session(profile, (num_users, num_roles, num_resources), seed))
 
-            start_time = time.time()
-            users, roles, resources, policies, G = generate_abac_model(num_users, num_roles, num_resources)
-            build_time = time.time() - start_time
+    if snapshot_dir is not None:
+        # Generate here is the snapshot load (or the first generate and save)
+        sizes = (num_users, num_roles, num_resources)
+        model, G = timer.measure('Generate', load_or_generate, snapshot_dir, 'abac_dag', sizes, seed,
+                                 partial(generate_policy_graph, *sizes, batched, seed), 'networkx')
+    else:
+        users, roles, resources, policies, model_graph = timer.measure(
+            'Generate', generate_abac_model, num_users, num_roles, num_resources, rng=seed)
 
-            G = build_abac_graph(G, roles, resources)
+        # The build adds edges in place, so every run starts from a fresh copy
+        build = build_abac_graph_batched if batched else build_abac_graph
+        G = timer.measure('Build', build, setup=lambda: (model_graph.copy(), roles, resources))
 
-            start_time = time.time()
-            detected_paths, traversal_frequency = detect_privilege_escalation(G)
-            detection_time = time.time() - start_time
+    detect = {'nested': detect_privilege_escalation, 'batched': detect_privilege_escalation_batched,
+              'cached': detect_privilege_escalation_cached, 'patterns': detect_escalation_patterns}[detector]
+    cache_columns = ['', '', '']
+    if detector == 'cached':
+        (detected_paths, traversal_frequency), cache_columns = measure_with_cache(timer, 'Detect', detect, G,
+                                                                                  role_chain_cache)
+    else:
+        detected_paths, traversal_frequency = timer.measure('Detect', detect, G)
 
-            graph_size = G.number_of_nodes() + G.number_of_edges()
+    graph_size = G.number_of_nodes() + G.number_of_edges()
 
-            results.append([num_users, num_roles, num_resources, traversal_frequency, detection_time, graph_size, build_time])
+    return [num_users, num_roles, num_resources, traversal_frequency, timer.seconds('Detect'), graph_size,
+            timer.seconds('Generate') + timer.seconds('Build'), timer.seconds('Build')] + cache_columns + timer.columns() + [seed]
 
+def run_privilege_escalation_simulation(log_ranges, repetitions=10, batched=False, detector='nested', workers=1, seed=None,
+                                        snapshot_dir=None, resume=False, compress=False, runs=1, trace_memory=False, profile=None):
     csv_file = '/tmp/abac_privilege_escalation_traversal_frequency_results.csv'
+    header = ['Num_Users', 'Num_Roles', 'Num_Resources', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size',
+              'Graph_Build_Time', 'Edge_Build_Time'] + CACHE_HEADER + TIMING_HEADER + ['Seed']
+    return write_sweep(csv_file, header, run_configuration, log_ranges, repetitions, workers=workers, seed=seed,
+                       resume=resume, compress=compress, batched=batched, detector=detector, snapshot_dir=snapshot_dir, runs=runs,
+                       trace_memory=trace_memory,
+                       profile=profile.for_results(csv_file) if profile is not None else None)
+
+def set_role_permissions(detector, role, permissions, resources):
+    # Redraws one role's permissions and re-derives its role -> resource edges with
+    # the rule of build_abac_graph, so the graph stays what a rebuild would give
+    G = detector.G
+    for resource in list(G.successors(role)):
+        detector.remove_assignment(role, resource)
+    detector.set_role_permissions(role, permissions)
+    for resource, res_type in resources.items():
+        if (res_type == 'EC2Instance' and 'ec2:RunInstances' in permissions) or \
+                (res_type == 'IAMRole' and 'iam:PassRole' in permissions):
+            detector.add_assignment(role, resource)
+
+def apply_random_update(detector, users, roles, resources, rng):
+    # Toggle one random user-role assignment or redraw one role's permissions. The
+    # role -> resource edges of this model follow from permissions, so they change
+    # only through the permissions
+    G = detector.G
+    if rng.choice(['user_role', 'permissions']) == 'permissions':
+        role = rng.choice(roles)
+        return set_role_permissions(detector, role, rng.choices(ALL_PERMISSIONS, k=rng.randint(1, len(ALL_PERMISSIONS))),
+                                    resources)
+
+    u, v = rng.choice(users), rng.choice(roles)
+    if G.has_edge(u, v):
+        return detector.remove_assignment(u, v)
+    return detector.add_assignment(u, v)
+
+def run_update_benchmark(log_ranges, num_updates=100, seed=None):
+    rng = make_rng(seed)
+    results = []
+
+    for num_users, num_roles, num_resources in log_ranges:
+        model_seed = rng.getrandbits(32)
+        users, roles, resources, policies, G = generate_abac_model(num_users, num_roles, num_resources, rng=model_seed)
+        G = build_abac_graph(G, roles, resources)
+        detector = IncrementalABACDetector(G)
+
+        start_time = time.perf_counter()
+        detect_privilege_escalation(G)
+        full_recompute_time = time.perf_counter() - start_time
+
+        update_times = []
+        for _ in range(num_updates):
+            start_time = time.perf_counter()
+            apply_random_update(detector, list(users), list(roles), resources, rng)
+            update_times.append(time.perf_counter() - start_time)
+
+        results.append([num_users, num_roles, num_resources, num_updates, sum(update_times) / len(update_times),
+                        max(update_times), full_recompute_time, model_seed])
+
+    csv_file = '/tmp/abac_dag_incremental_update_results.csv'
     with open(csv_file, mode='w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(['Num_Users', 'Num_Roles', 'Num_Resources', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size', 'Graph_Build_Time'])
+        writer.writerow(['Num_Users', 'Num_Roles', 'Num_Resources', 'Num_Updates', 'Update_Latency', 'Max_Update_Latency',
+                         'Full_Recompute_Latency', 'Seed'])
         for row in results:
             writer.writerow(row)
 
     return csv_file
 
+def replay_model(csv_file, row_number):
+    # Rebuild the exact model and graph behind one CSV row, e.g. to profile a slow case in isolation
+    (num_users, num_roles, num_resources), seed = load_row_configuration(csv_file, row_number)
+    users, roles, resources, policies, G = generate_abac_model(num_users, num_roles, num_resources, rng=seed)
+    G = build_abac_graph(G, roles, resources)
+
+    return users, roles, resources, policies, G
+
 
 if __name__ == "__main__":
     log_ranges = [
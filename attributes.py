@@ -0,0 +1,34 @@
+import sys
+
+ATTRIBUTE_MODES = ('per_entity', 'shared')
+
+
+class AttributeTable:
+    # Global table of the (key, value) attribute pairs in a model, with integer IDs
+    # and one interned 'key:value' label each. In shared mode every entity with the
+    # same pair links to the same attribute node, as the DAG models do; in
+    # per_entity mode each entity gets its own '<entity>_key:value' node, as the
+    # hypergraph models always have
+    def __init__(self, mode='per_entity'):
+        if mode not in ATTRIBUTE_MODES:
+            raise ValueError(f"Unknown attribute mode {mode!r}, expected one of {ATTRIBUTE_MODES}")
+        self.mode = mode
+        self.ids = {}
+        self.labels = []
+
+    def intern(self, key, value):
+        attribute_id = self.ids.get((key, value))
+        if attribute_id is None:
+            attribute_id = len(self.labels)
+            self.ids[(key, value)] = attribute_id
+            self.labels.append(sys.intern(f'{key}:{value}'))
+        return attribute_id
+
+    def node(self, entity, key, value):
+        label = self.labels[self.intern(key, value)]
+        if self.mode == 'shared':
+            return label
+        return f'{entity}_{label}'
+
+    def __len__(self):
+        return len(self.labels)
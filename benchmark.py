@@ -0,0 +1,164 @@
+import csv
+import gzip
+import importlib.util
+import math
+import os
+
+import numpy as np
+
+from footprint import memory_footprint
+from iam_ingest import generate_inventory
+from incidence import hypergraph_from_incidence
+from profiling import profile_session
+from sweep import write_sweep
+from timing import TIMING_HEADER, PhaseTimer
+
+MODELS = ['ABAC_DAG', 'NGAC_DAG', 'NGAC_Hypergraph']
+GROWTH_METRICS = ['Detection_Time', 'Graph_Size']
+
+_scripts = {}
+
+
+def load_script(file_name):
+    # The model scripts have hyphenated file names, so they are loaded by path,
+    # once per process
+    if file_name not in _scripts:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+        spec = importlib.util.spec_from_file_location(os.path.splitext(file_name)[0].replace('-', '_'), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[file_name] = module
+    return _scripts[file_name]
+
+def generate_scenario(num_users, num_roles, num_policies, num_resources, rng=None):
+    # One canonical PAM scenario: a generated IAM account with its grants and
+    # trust relationships resolved, ready to be projected into every model
+    inventory = generate_inventory(num_users, num_roles, num_policies, num_resources, rng=rng)
+    inventory.resolve()
+    return inventory
+
+def build_hypergraph(inventory, backend='hypernetx'):
+    # (layers, H): the hypergraph projection, as an hnx.Hypergraph or, for the
+    # sparse backend, the bare incidence arrays, with the node layers a multi-hop
+    # path runs through (users, roles, permissions, resources)
+    users, resources, permissions, policy_classes, incidence = inventory.hypergraph_incidence()
+    layers = [list(users), [f'Role_{name}' for name in inventory.roles], permissions, list(resources)]
+    if backend == 'hypernetx':
+        return layers, hypergraph_from_incidence(incidence)
+    return layers, incidence
+
+def _run_model(model, inventory, timer, dag_backend, hypergraph_backend):
+    # (escalation paths, path complexity, traversal count, graph size, graph) of
+    # one model, with its projection timed as Build and its detector as Detect
+    if model == 'ABAC_DAG':
+        G = timer.measure('Build', lambda: inventory.abac_model()[-1])
+        escalation_paths, traversal_frequency = timer.measure(
+            'Detect', load_script('abac-dag.py').detect_privilege_escalation, G)
+        # Every ABAC witness is a (role, IAMRole, role) chain below the user
+        path_lengths = [len(path) for path in escalation_paths.values()]
+        path_complexity = sum(path_lengths) / len(path_lengths) if path_lengths else 0
+        return escalation_paths, path_complexity, traversal_frequency, G.number_of_nodes() + G.number_of_edges(), G
+
+    if model == 'NGAC_DAG':
+        G = timer.measure('Build', lambda: inventory.ngac_dag_model(backend=dag_backend)[-1])
+        escalation_paths, path_complexity, traversal_frequency = timer.measure(
+            'Detect', load_script('ngac-dag-policy-full-model.py').detect_privilege_escalation, G)
+        return escalation_paths, path_complexity, traversal_frequency, G.number_of_nodes() + G.number_of_edges(), G
+
+    # A user's grants reach a policy class over several hyperedges (user -> role ->
+    # permission/resource edge -> resource -> policy class edge), so the hypergraph
+    # answers the same question as the DAGs with the multi-hop search from the users
+    layers, H = timer.measure('Build', build_hypergraph, inventory, hypergraph_backend)
+    escalation_paths, path_complexity, traversal_frequency = timer.measure(
+        'Detect', load_script('ngac-hypergraph-fixed.py').detect_privilege_escalation_multi_hop, H,
+        sources=layers[0], layers=layers, max_depth=len(layers))
+    if hypergraph_backend == 'hypernetx':
+        graph_size = len(H.nodes) + len(H.edges)
+    else:
+        graph_size = len(H.node_names) + len(H.edge_names)
+    return escalation_paths, path_complexity, traversal_frequency, graph_size, H
+
+def run_configuration(num_users, num_roles, num_policies, num_resources, models=MODELS, dag_backend='networkx',
+                      hypergraph_backend='hypernetx', seed=None, runs=1, trace_memory=False, profile=None):
+    # One row per model, all projected from the same scenario and measured by the
+    # same PhaseTimer settings. The scenario is generated once, and its Generate
+    # timings are repeated on every model's row
+    sizes = (num_users, num_roles, num_policies, num_resources)
+    scenario_timer = PhaseTimer(runs, trace_memory, profile_session(profile, sizes, seed, 'Scenario'))
+    inventory = scenario_timer.measure('Generate', generate_scenario, num_users, num_roles, num_policies, num_resources,
+                                       rng=seed)
+
+    rows = []
+    for model in models:
+        timer = PhaseTimer(runs, trace_memory, profile_session(profile, sizes, seed, model))
+        timer.share('Generate', scenario_timer)
+
+        escalation_paths, path_complexity, traversal_frequency, graph_size, graph = _run_model(
+            model, inventory, timer, dag_backend, hypergraph_backend)
+
+        # Every model's detector is run from the users only, so all columns cover the same user set
+        escalations = len(escalation_paths)
+        rows.append([model, num_users, num_roles, num_policies, num_resources, escalations,
+                     escalations / max(1, num_users), path_complexity, traversal_frequency, timer.seconds('Detect'),
+                     graph_size, memory_footprint(graph)] + timer.columns() + [seed])
+
+    return rows
+
+def fit_growth_exponents(csv_file, metrics=GROWTH_METRICS):
+    # Least-squares fit of log(metric) = exponent * log(users) + log(coefficient)
+    # over every row of each model, so metric ~ coefficient * users ** exponent.
+    # Rows with a non-positive value are left out of the fit
+    opener = gzip.open if csv_file.endswith('.gz') else open
+    points = {}
+    with opener(csv_file, 'rt', newline='') as file:
+        for row in csv.DictReader(file):
+            for metric in metrics:
+                users, value = float(row['Num_Users']), float(row[metric] or 0)
+                if users > 0 and value > 0:
+                    points.setdefault((row['Model'], metric), []).append((math.log(users), math.log(value)))
+
+    fits = []
+    for (model, metric), model_points in points.items():
+        x, y = np.array(model_points).T
+        if len(np.unique(x)) < 2:
+            continue
+        exponent, intercept = np.polyfit(x, y, 1)
+        residual = y - (exponent * x + intercept)
+        total = np.sum((y - y.mean()) ** 2)
+        r_squared = 1 - np.sum(residual ** 2) / total if total > 0 else 1.0
+        fits.append([model, metric, float(exponent), math.exp(intercept), float(r_squared), len(model_points)])
+
+    return fits
+
+def write_growth_exponents(csv_file, growth_file, metrics=GROWTH_METRICS):
+    with open(growth_file, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Model', 'Metric', 'Exponent', 'Coefficient', 'R_Squared', 'Points'])
+        writer.writerows(fit_growth_exponents(csv_file, metrics))
+    return growth_file
+
+def run_benchmark(log_ranges, repetitions=3, models=MODELS, dag_backend='networkx', hypergraph_backend='hypernetx',
+                  workers=1, seed=None, resume=False, compress=False, runs=1, trace_memory=False, profile=None):
+    csv_file = '/tmp/pam_model_benchmark_results.csv'
+    header = ['Model', 'Num_Users', 'Num_Roles', 'Num_Policies', 'Num_Resources', 'Escalations', 'Detection_Accuracy',
+              'Path_Complexity', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size', 'Graph_Memory'] + TIMING_HEADER + ['Seed']
+    csv_file = write_sweep(csv_file, header, run_configuration, log_ranges, repetitions, workers=workers, seed=seed,
+                           resume=resume, compress=compress, rows_per_job=len(models), models=models,
+                           dag_backend=dag_backend, hypergraph_backend=hypergraph_backend, runs=runs,
+                           trace_memory=trace_memory,
+                           profile=profile.for_results(csv_file) if profile is not None else None)
+
+    growth_file = write_growth_exponents(csv_file, '/tmp/pam_model_benchmark_growth.csv')
+    return csv_file, growth_file
+
+
+if __name__ == "__main__":
+    log_ranges = [
+        (100, 20, 10, 30),
+        (200, 40, 20, 60),
+        (400, 80, 40, 120),
+        (800, 160, 80, 240),
+        (1000, 200, 100, 300),
+        (2000, 400, 200, 600),
+    ]
+    run_benchmark(log_ranges, repetitions=3)
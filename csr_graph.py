@@ -0,0 +1,219 @@
+from array import array
+
+import numpy as np
+
+# Node types used across the policy graph models, stored as one byte per node
+NODE_TYPES = [
+    'User', 'UserAttribute', 'Resource', 'ResourceAttribute', 'Permission', 'PolicyClass',
+    'Role', 'EC2Instance', 'S3Bucket', 'IAMRole'
+]
+NODE_TYPE_CODES = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+# Code of a node only seen as an edge endpoint so far; none may be left in a built graph
+UNTYPED = 255
+
+
+class CSRGraphBuilder:
+    # Collects nodes and edges through the same add_node/add_edge calls the
+    # networkx models use, interning node names to integer IDs as they arrive
+    def __init__(self):
+        self.node_ids = {}
+        self.node_names = []
+        self.types = array('B')
+        self.node_data = {}
+        self.sources = array('i')
+        self.targets = array('i')
+
+    def _intern(self, node):
+        node_id = self.node_ids.get(node)
+        if node_id is None:
+            node_id = len(self.node_names)
+            self.node_ids[node] = node_id
+            self.node_names.append(node)
+            self.types.append(UNTYPED)
+        return node_id
+
+    def add_node(self, node, type=None, **data):
+        node_id = self._intern(node)
+        if type is not None:
+            self.types[node_id] = NODE_TYPE_CODES[type]
+        if data:
+            self.node_data.setdefault(node, {}).update(data)
+
+    def add_edge(self, u, v):
+        self.sources.append(self._intern(u))
+        self.targets.append(self._intern(v))
+
+    def add_edges_from(self, edges):
+        for u, v in edges:
+            self.add_edge(u, v)
+
+    def copy(self):
+        builder = CSRGraphBuilder()
+        builder.node_ids = dict(self.node_ids)
+        builder.node_names = list(self.node_names)
+        builder.types = array('B', self.types)
+        builder.node_data = {node: dict(data) for node, data in self.node_data.items()}
+        builder.sources = array('i', self.sources)
+        builder.targets = array('i', self.targets)
+        return builder
+
+    def to_graph(self):
+        untyped = [name for name, code in zip(self.node_names, self.types) if code == UNTYPED]
+        if untyped:
+            raise ValueError(f"{len(untyped)} nodes were never added with a type, e.g. {untyped[0]!r}")
+        return CSRGraph.from_edges(self.node_names, np.frombuffer(self.types, dtype=np.uint8),
+                                   np.frombuffer(self.sources, dtype=np.int32),
+                                   np.frombuffer(self.targets, dtype=np.int32),
+                                   node_ids=self.node_ids, node_data=self.node_data)
+
+
+def _csr(num_nodes, sources, targets):
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+    return offsets, targets[order].astype(np.int32)
+
+
+class CSRGraph:
+    # Read-only directed graph with integer node IDs, a type-code array and CSR
+    # adjacency; the networkx-style views below let the existing detectors and
+    # graph_size metric run on it unchanged
+    def __init__(self, node_names, types, offsets, targets, node_ids=None, node_data=None):
+        self.node_names = node_names
+        self.node_ids = node_ids if node_ids is not None else {n: i for i, n in enumerate(node_names)}
+        # Extra per-node attributes beyond the type, e.g. role permissions in the ABAC models
+        self.node_data = node_data if node_data is not None else {}
+        self.types = types
+        self.offsets = offsets
+        self.targets = targets
+        self._reverse = None
+
+    @classmethod
+    def from_edges(cls, node_names, types, sources, targets, node_ids=None, node_data=None):
+        num_nodes = len(node_names)
+        # Duplicate edges collapse, as they do in nx.DiGraph, and each node's
+        # successors keep the order their edges were first added in, so detectors
+        # that report the last match see the same successor as with networkx
+        _, first = np.unique(sources.astype(np.int64) * num_nodes + targets, return_index=True)
+        first.sort()
+        offsets, targets = _csr(num_nodes, np.asarray(sources)[first], np.asarray(targets)[first])
+        return cls(node_names, np.array(types, dtype=np.uint8), offsets, targets, node_ids, node_data)
+
+    def reverse_csr(self):
+        if self._reverse is None:
+            sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.offsets))
+            self._reverse = _csr(self.num_nodes, self.targets, sources)
+        return self._reverse
+
+    @property
+    def num_nodes(self):
+        return len(self.node_names)
+
+    def type_code(self, node_type):
+        return NODE_TYPE_CODES[node_type]
+
+    def successor_ids(self, node_id):
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def predecessor_ids(self, node_id):
+        offsets, targets = self.reverse_csr()
+        return targets[offsets[node_id]:offsets[node_id + 1]]
+
+    # networkx-compatible read API
+
+    @property
+    def nodes(self):
+        return _NodeView(self)
+
+    @property
+    def succ(self):
+        return _AdjacencyView(self, self.successor_ids)
+
+    @property
+    def pred(self):
+        return _AdjacencyView(self, self.predecessor_ids)
+
+    adj = _succ = _adj = succ
+    _pred = pred
+
+    def successors(self, node):
+        return iter(self.succ[node])
+
+    def predecessors(self, node):
+        return iter(self.pred[node])
+
+    neighbors = successors
+
+    def edges(self):
+        names = self.node_names
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.offsets))
+        return [(names[u], names[v]) for u, v in zip(sources.tolist(), self.targets.tolist())]
+
+    def is_directed(self):
+        return True
+
+    def is_multigraph(self):
+        return False
+
+    def has_node(self, node):
+        return node in self.node_ids
+
+    __contains__ = has_node
+
+    def __iter__(self):
+        return iter(self.node_names)
+
+    def __len__(self):
+        return self.num_nodes
+
+    def number_of_nodes(self):
+        return self.num_nodes
+
+    def number_of_edges(self):
+        return len(self.targets)
+
+    def nbytes(self):
+        return self.types.nbytes + self.offsets.nbytes + self.targets.nbytes
+
+
+class _NodeView:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __call__(self, data=False):
+        if not data:
+            return iter(self.graph.node_names)
+        node_data = self.graph.node_data
+        return ((name, {'type': NODE_TYPES[code], **node_data.get(name, {})})
+                for name, code in zip(self.graph.node_names, self.graph.types.tolist()))
+
+    def __getitem__(self, node):
+        return {'type': NODE_TYPES[self.graph.types[self.graph.node_ids[node]]], **self.graph.node_data.get(node, {})}
+
+    def __iter__(self):
+        return iter(self.graph.node_names)
+
+    def __len__(self):
+        return self.graph.num_nodes
+
+    def __contains__(self, node):
+        return node in self.graph.node_ids
+
+
+class _AdjacencyView:
+    def __init__(self, graph, neighbor_ids):
+        self.graph = graph
+        self.neighbor_ids = neighbor_ids
+
+    def __getitem__(self, node):
+        names = self.graph.node_names
+        return {names[i]: {} for i in self.neighbor_ids(self.graph.node_ids[node]).tolist()}
+
+    def __iter__(self):
+        return iter(self.graph.node_names)
+
+    def __len__(self):
+        return self.graph.num_nodes
+
+    def __contains__(self, node):
+        return node in self.graph.node_ids
@@ -0,0 +1,179 @@
+from collections import namedtuple
+
+from csr_graph import NODE_TYPES
+from evaluation_cache import EvaluationCache
+
+# One hop of an escalation pattern: a node type and the permissions the node must hold
+Step = namedtuple('Step', ['type', 'permissions'])
+
+# Escalation catalogue in the pattern language: node types joined by '->', each
+# optionally followed by the permissions it needs in brackets. Every pattern can
+# match IAMInventory.abac_model graphs. abac-dag.py graphs have no IAMRole -> Role
+# edges, and a role gets IAMRole edges only with iam:PassRole, so only
+# PassRole_EC2Instance, AttachRolePolicy and UpdateAssumeRolePolicy match there.
+# pam-abac.py links IAMRole -> Role only in its ground truth chains, whose roles
+# hold just iam:PassRole or ec2:RunInstances, so only PassRole_RunInstances does
+ESCALATION_PATTERNS = {
+    'PassRole_RunInstances': 'User -> Role[iam:PassRole] -> IAMRole -> Role[ec2:RunInstances]',
+    'PassRole_EC2Instance': 'User -> Role[iam:PassRole, ec2:RunInstances] -> EC2Instance',
+    'AttachRolePolicy': 'User -> Role[iam:AttachRolePolicy] -> IAMRole',
+    'UpdateAssumeRolePolicy': 'User -> Role[iam:UpdateAssumeRolePolicy] -> IAMRole',
+    'UpdateRole_PassRole': 'User -> Role[iam:UpdateRole] -> IAMRole -> Role[iam:PassRole]',
+    'AttachRolePolicy_Chain': 'User -> Role[iam:AttachRolePolicy] -> IAMRole -> Role[iam:PassRole] -> IAMRole',
+}
+
+
+def parse_pattern(pattern):
+    steps = []
+    for hop in pattern.split('->'):
+        hop = hop.strip()
+        node_type, _, permissions = hop.partition('[')
+        node_type = node_type.strip()
+        if node_type not in NODE_TYPES:
+            raise ValueError(f"Unknown node type {node_type!r} in pattern {pattern!r}")
+        if permissions and not permissions.endswith(']'):
+            raise ValueError(f"Unclosed permission list in pattern {pattern!r}")
+        steps.append(Step(node_type, frozenset(p.strip() for p in permissions[:-1].split(',') if p.strip())))
+    return tuple(steps)
+
+
+class PatternAutomaton:
+    # Every pattern of a catalogue compiled into one prefix automaton: patterns that
+    # share leading steps share states, and a node can advance several states at
+    # once (a role holding both iam:PassRole and iam:AttachRolePolicy), so the whole
+    # catalogue is matched in a single traversal of the graph
+    def __init__(self, patterns):
+        self.names = list(patterns)
+        self.transitions = [{}]
+        self.accepts = [[]]
+
+        for name, pattern in patterns.items():
+            steps = parse_pattern(pattern) if isinstance(pattern, str) else tuple(pattern)
+            state = 0
+            for step in steps:
+                if step not in self.transitions[state]:
+                    self.transitions[state][step] = len(self.transitions)
+                    self.transitions.append({})
+                    self.accepts.append([])
+                state = self.transitions[state][step]
+            self.accepts[state].append(name)
+
+    def advance(self, states, node_type, permissions):
+        next_states = []
+        for state in states:
+            for step, next_state in self.transitions[state].items():
+                if step.type == node_type and step.permissions <= permissions:
+                    next_states.append(next_state)
+        return tuple(next_states)
+
+    def match(self, G):
+        # Returns ({pattern: {source: path after the source}}, number of (node,
+        # states) pairs evaluated). Each pair is evaluated once however many sources
+        # reach it, and keeps the first completion of each pattern in successor order
+        matches = {name: {} for name in self.names}
+        node_info = {}
+        completions = {}
+
+        def info(node):
+            if node not in node_info:
+                data = G.nodes[node]
+                node_info[node] = (data['type'], frozenset(data.get('permissions', ())))
+            return node_info[node]
+
+        def complete(node, states):
+            # {pattern: path after node} for every pattern completable from node in states
+            key = (node, states)
+            if key in completions:
+                return completions[key]
+
+            result = {}
+            for state in states:
+                for name in self.accepts[state]:
+                    result.setdefault(name, ())
+            for successor in G.successors(node):
+                next_states = self.advance(states, *info(successor))
+                if next_states:
+                    for name, suffix in complete(successor, next_states).items():
+                        if name not in result:
+                            result[name] = (successor,) + suffix
+
+            completions[key] = result
+            return result
+
+        for source in G.nodes():
+            states = self.advance((0,), *info(source))
+            if states:
+                for name, path in complete(source, states).items():
+                    matches[name][source] = path
+
+        return matches, len(completions)
+
+
+def _run_instances_role(G, resource):
+    # First role an IAMRole resource leads to that can ec2:RunInstances
+    for next_role in G.successors(resource):
+        if G.nodes[next_role]['type'] == 'Role' and 'ec2:RunInstances' in G.nodes[next_role]['permissions']:
+            return next_role
+    return None
+
+def _role_chain(cache, node):
+    # Cached evaluation of one ABAC node. An IAMRole resource maps to the first role
+    # it leads to that can ec2:RunInstances (or None). A role maps to the (role,
+    # resource, next_role) witness the nested user -> role -> IAMRole -> role walk
+    # reports for it (the last IAMRole it can iam:PassRole into that leads to an
+    # ec2:RunInstances role, or None), and how many IAMRole and next-role hops that
+    # walk takes from it
+    G = cache.G
+    data = G.nodes[node]
+    if data['type'] == 'IAMRole':
+        return _run_instances_role(G, node)
+
+    witness = None
+    iam_role_hops = 0
+    next_role_hops = 0
+    if 'iam:PassRole' in data['permissions']:
+        for resource in G.successors(node):
+            if G.nodes[resource]['type'] != 'IAMRole':
+                continue
+            iam_role_hops += 1
+            next_role = cache.get(resource)
+            if next_role is not None:
+                next_role_hops += 1
+                witness = (node, resource, next_role)
+
+    return witness, iam_role_hops, next_role_hops
+
+def role_chain_cache(G):
+    # A role's entry depends on the permissions of roles two hops below it
+    return EvaluationCache(G, _role_chain, depth=2)
+
+def escalation_capable_roles(G, cache=None):
+    # One pass over the roles of an ABAC graph, giving every role its role_chain
+    # entry. IAMRole resources shared by several roles are resolved once
+    if cache is None:
+        cache = role_chain_cache(G)
+    return {role: cache.get(role) for role, data in G.nodes(data=True) if data['type'] == 'Role'}
+
+def batched_role_chain_escalation(G, roles=None, users=None):
+    # Resolves every user (or only the given users) against the escalation-capable
+    # roles with one membership check per assigned role, giving the same witnesses
+    # as the nested walk (the last capable role wins) and the same traversal count.
+    # roles is either the escalation_capable_roles table or a role_chain_cache that
+    # evaluates each role the first time a user reaches it
+    if roles is None:
+        roles = escalation_capable_roles(G)
+    if users is None:
+        users = [n for n, d in G.nodes(data=True) if d['type'] == 'User']
+
+    escalation_paths = {}
+    traversal_count = 0
+    for user in users:
+        for role in G.successors(user):
+            if G.nodes[role]['type'] != 'Role':
+                continue
+            witness, iam_role_hops, next_role_hops = roles[role]
+            traversal_count += 1 + iam_role_hops + next_role_hops
+            if witness is not None:
+                escalation_paths[user] = witness
+
+    return escalation_paths, traversal_count
@@ -0,0 +1,89 @@
+from collections import namedtuple
+from itertools import islice
+
+from escalation import role_chain_cache
+from reachability import policy_class_cache
+
+# Totals of an escalation stream; escalation_paths is None in bounded-memory mode
+EscalationSummary = namedtuple('EscalationSummary',
+                               ['escalation_paths', 'num_users', 'path_complexity', 'num_results'])
+
+# The iterators below yield (user, witness, path_length) as each escalation is
+# found, with all results of one user consecutive, so callers can stop early
+# instead of waiting for every user to be resolved
+
+
+def iter_role_chain_escalations(G, cache=None):
+    # ABAC user -> role -> IAMRole -> role chains, one result per flagged user with
+    # the witness detect_privilege_escalation reports (the last capable role
+    # wins). Role chains are evaluated the first time a user reaches them
+    if cache is None:
+        cache = role_chain_cache(G)
+
+    for user, data in G.nodes(data=True):
+        if data['type'] != 'User':
+            continue
+        witness = None
+        for role in G.successors(user):
+            if G.nodes[role]['type'] == 'Role':
+                role_witness = cache.get(role)[0]
+                if role_witness is not None:
+                    witness = role_witness
+        if witness is not None:
+            yield user, witness, len(witness)
+
+def iter_policy_class_escalations(G, cache=None):
+    # NGAC DAG policy classes reachable from each user with their shortest hop
+    # counts, one result per (user, policy class). Per-node distances come from a
+    # policy_class_cache, filled as users reach them and shared by every user
+    # above a node, so a user costs one cache lookup instead of a fresh search
+    if cache is None:
+        cache = policy_class_cache(G)
+
+    for user, data in G.nodes(data=True):
+        if data['type'] != 'User':
+            continue
+        for policy_class, distance in cache.get(user).items():
+            yield user, policy_class, distance
+
+def iter_hyperedge_escalations(index, name_pattern='User_'):
+    # Single-hyperedge escalations of every node whose name contains name_pattern,
+    # from a (node_edges, policy_class_edges, edge_members) inverted index, one
+    # result per edge shared with a policy class
+    node_edges, policy_class_edges, edge_members = index
+    for node, edges in node_edges.items():
+        if name_pattern not in node:
+            continue
+        for edge_key in edges:
+            if edge_key in policy_class_edges:
+                yield node, edge_members[edge_key], 1
+
+def first_escalations(results, n):
+    # The first n results; the search stops as soon as they are found
+    return list(islice(results, n))
+
+def any_escalation(results):
+    # The first result, or None once the whole stream turns out to be empty
+    return next(iter(results), None)
+
+def summarize_escalations(results, keep_paths=True):
+    # Consumes a stream into the totals the batch detectors report: each user's
+    # last witness, the number of flagged users, the mean path length and the
+    # number of results. With keep_paths=False only counts and a running mean are
+    # kept, so memory stays constant however many users there are
+    escalation_paths = {} if keep_paths else None
+    num_users = 0
+    num_results = 0
+    mean_length = 0.0
+    last_user = None
+
+    for user, witness, path_length in results:
+        num_results += 1
+        mean_length += (path_length - mean_length) / num_results
+        if user != last_user:
+            num_users += 1
+            last_user = user
+        if keep_paths:
+            escalation_paths[user] = witness
+
+    return EscalationSummary(escalation_paths, num_users, mean_length if num_results else 0, num_results)
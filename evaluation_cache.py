@@ -0,0 +1,78 @@
+CACHE_HEADER = ['Cache_Hits', 'Cache_Misses', 'Cache_Hit_Rate']
+
+
+class EvaluationCache:
+    # Memoized per-node evaluations shared by every user a detector resolves:
+    # evaluate(cache, node) computes what is reachable from node (escalation
+    # witnesses, policy class distances) and may consult the cache for the nodes
+    # below it. An entry can depend on the graph up to depth hops below its node
+    # (None for unbounded), so a change invalidates the changed node and its
+    # ancestors up to that many hops
+    def __init__(self, G, evaluate, depth=None):
+        self.G = G
+        self.evaluate = evaluate
+        self.depth = depth
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, node):
+        if node in self.entries:
+            self.hits += 1
+            return self.entries[node]
+        self.misses += 1
+        value = self.evaluate(self, node)
+        self.entries[node] = value
+        return value
+
+    __getitem__ = get
+
+    def invalidate(self, node, depth=None):
+        # Drops node and its ancestors up to depth reverse hops (all of them for None)
+        dropped = 0
+        frontier = [node]
+        seen = {node}
+        hops = 0
+        while frontier and (depth is None or hops <= depth):
+            next_frontier = []
+            for current in frontier:
+                if current in self.entries:
+                    del self.entries[current]
+                    dropped += 1
+                if not self.G.has_node(current):
+                    continue
+                for predecessor in self.G.predecessors(current):
+                    if predecessor not in seen:
+                        seen.add(predecessor)
+                        next_frontier.append(predecessor)
+            frontier = next_frontier
+            hops += 1
+        return dropped
+
+    def node_changed(self, node):
+        # Hook for a change to node's attributes (a role's permissions, say)
+        return self.invalidate(node, self.depth)
+
+    def edge_changed(self, u, v):
+        # Hook for an added or removed u -> v edge; entries see it from one hop
+        # less far up than a change to u itself
+        return self.invalidate(u, None if self.depth is None else self.depth - 1)
+
+    def clear(self):
+        self.entries = {}
+
+    def stats(self):
+        # (hits, misses, hit rate) since the cache was created
+        return self.hits, self.misses, self.hits / max(1, self.hits + self.misses)
+
+def measure_with_cache(timer, phase, detect, G, make_cache):
+    # Times detect(G, cache) with a fresh make_cache(G) for every run, and returns
+    # its result with the CACHE_HEADER columns read off the last of those caches
+    caches = [None]
+
+    def fresh_cache():
+        caches[0] = make_cache(G)
+        return G, caches[0]
+
+    result = timer.measure(phase, detect, setup=fresh_cache)
+    return result, list(caches[0].stats())
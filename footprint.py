@@ -0,0 +1,46 @@
+import sys
+import types
+
+import numpy as np
+
+# Objects a graph refers to without owning them
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def memory_footprint(*objects):
+    # Bytes held by the objects and everything they reference, counting each object
+    # once, so an attribute label shared by many nodes is counted once. numpy arrays
+    # count their buffers (and the objects in object arrays), pandas objects their
+    # deep memory usage
+    seen = set()
+    total = 0
+    stack = list(objects)
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+
+        if callable(getattr(current, 'memory_usage', None)):
+            total += int(np.sum(current.memory_usage(deep=True)))
+            continue
+
+        total += sys.getsizeof(current)
+        if isinstance(current, np.ndarray):
+            if current.base is not None:
+                stack.append(current.base)
+            if current.dtype == object:
+                stack.extend(current.ravel().tolist())
+        elif isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif not isinstance(current, (str, bytes, int, float, complex, bool, type(None))):
+            stack.extend(getattr(current, '__dict__', {}).values())
+            for slot in getattr(type(current), '__slots__', ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+
+    return total
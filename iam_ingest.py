@@ -0,0 +1,594 @@
+import asyncio
+import gzip
+import json
+from fnmatch import fnmatchcase
+from urllib.parse import unquote
+
+import networkx as nx
+
+from attributes import AttributeTable
+from csr_graph import CSRGraphBuilder
+from incidence import IncidenceBuilder
+from sweep import make_rng
+
+# Actions the PAM models track, as spelled in the generated models
+PAM_ACTIONS = [
+    'iam:PassRole', 'ec2:RunInstances', 's3:PutObject',
+    'iam:AttachRolePolicy', 'iam:UpdateRole', 'iam:UpdateAssumeRolePolicy'
+]
+# Resource type each tracked action applies to
+ACTION_RESOURCE_TYPES = {
+    'iam:PassRole': 'IAMRole', 'ec2:RunInstances': 'EC2Instance', 's3:PutObject': 'S3Bucket',
+    'iam:AttachRolePolicy': 'IAMRole', 'iam:UpdateRole': 'IAMRole', 'iam:UpdateAssumeRolePolicy': 'IAMRole'
+}
+POLICY_CLASSES = ['IAM', 'EC2', 'S3', 'KMS', 'RDS']
+
+_WHITESPACE = ' \t\n\r'
+
+
+def resource_type(arn):
+    # ABAC resource type of an ARN, or None for services the models do not type
+    parts = arn.split(':', 5)
+    if len(parts) < 6:
+        return None
+    service, resource = parts[2], parts[5]
+    if service == 'ec2' and resource.startswith('instance/'):
+        return 'EC2Instance'
+    if service == 's3':
+        return 'S3Bucket'
+    if service == 'iam' and resource.startswith('role/'):
+        return 'IAMRole'
+    return None
+
+def account_of(arn):
+    parts = arn.split(':', 5)
+    return parts[4] if len(parts) == 6 else ''
+
+
+class _StreamReader:
+    # Incremental JSON reader over a file read in chunks off the event loop. Only
+    # the unconsumed tail of the current chunk and the value being decoded are
+    # held in memory
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.offset = 0
+        self.eof = False
+
+    async def _read(self):
+        chunk = await asyncio.get_running_loop().run_in_executor(None, self.file.read, self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+        # Drop the consumed prefix once it is a chunk long, so compaction stays amortized
+        if self.position >= self.chunk_size:
+            self.offset += self.position
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        self.buffer += chunk
+
+    async def peek(self):
+        # Next non-whitespace character, without consuming it ('' at the end)
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            await self._read()
+
+    async def expect(self, characters):
+        character = await self.peek()
+        if character == '' or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at offset {self.offset + self.position}, "
+                             f"found {character or 'end of file'!r}")
+        self.position += 1
+        return character
+
+    async def value(self):
+        # Decodes one complete value. A decode that fails or ends exactly at the end
+        # of the buffer (a number cut off by the chunk boundary) is retried with
+        # more input until the file runs out
+        await self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            await self._read()
+
+async def iter_authorization_details(path, chunk_size=1 << 20):
+    # Yields (section, entry) for every entry of the top-level lists of an account
+    # authorization details export (UserDetailList, GroupDetailList,
+    # RoleDetailList, Policies) as soon as it has been parsed; scalar fields such
+    # as IsTruncated are skipped. Gzip files are read transparently
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as file:
+        reader = _StreamReader(file, chunk_size)
+        await reader.expect('{')
+        if await reader.peek() == '}':
+            return
+
+        while True:
+            section = await reader.value()
+            await reader.expect(':')
+            if await reader.peek() == '[':
+                await reader.expect('[')
+                if await reader.peek() == ']':
+                    await reader.expect(']')
+                else:
+                    while True:
+                        yield section, await reader.value()
+                        if await reader.expect(',]') == ']':
+                            break
+            else:
+                await reader.value()
+
+            if await reader.expect(',}') == '}':
+                return
+
+def _as_list(value):
+    return [value] if isinstance(value, str) else list(value)
+
+def _statement_list(document):
+    if isinstance(document, str):
+        document = json.loads(unquote(document))
+    statements = document.get('Statement', [])
+    return [statements] if isinstance(statements, dict) else statements
+
+def policy_statements(document, actions=PAM_ACTIONS):
+    # Allow and Deny statements of a policy document as (effect, actions, resource
+    # patterns, not_resource) tuples, with action wildcards expanded to the tracked
+    # actions they cover (or, for NotAction, the tracked actions they leave out) and
+    # statements covering none of them dropped. not_resource marks a NotResource
+    # statement, which applies to every resource its patterns do not match.
+    # Documents may be dicts or the URL-encoded strings the raw API returns
+    compact = []
+    for statement in _statement_list(document):
+        effect = statement.get('Effect')
+        if effect not in ('Allow', 'Deny'):
+            raise ValueError(f"Statement with unknown Effect {effect!r}")
+        if 'Action' in statement:
+            patterns = _as_list(statement['Action'])
+            covered = tuple(action for action in actions
+                            if any(fnmatchcase(action.lower(), pattern.lower()) for pattern in patterns))
+        elif 'NotAction' in statement:
+            patterns = _as_list(statement['NotAction'])
+            covered = tuple(action for action in actions
+                            if not any(fnmatchcase(action.lower(), pattern.lower()) for pattern in patterns))
+        else:
+            continue
+        if not covered:
+            continue
+
+        not_resource = 'NotResource' in statement
+        resources = statement['NotResource'] if not_resource else statement.get('Resource', '*')
+        compact.append((effect, covered, tuple(_as_list(resources)), not_resource))
+    return compact
+
+def _trusted_principals(document):
+    # AWS principals an sts:AssumeRole trust policy allows and does not deny; a
+    # Deny naming '*' denies every principal
+    allowed = set()
+    denied = set()
+    for statement in _statement_list(document):
+        if 'NotAction' in statement or 'NotPrincipal' in statement:
+            raise ValueError("NotAction and NotPrincipal are not supported in trust policies")
+        if not any(fnmatchcase('sts:assumerole', a.lower()) for a in _as_list(statement.get('Action', []))):
+            continue
+        principal = statement.get('Principal', {})
+        aws = _as_list(principal if isinstance(principal, str) else principal.get('AWS', []))
+        if statement.get('Effect') == 'Allow':
+            allowed.update(aws)
+        elif statement.get('Effect') == 'Deny':
+            denied.update(aws)
+    return set() if '*' in denied else allowed - denied
+
+
+class IAMInventory:
+    # Compact view of an authorization details export: per user, group and role
+    # only the tracked Allow and Deny statements and attached managed policy ARNs, and per
+    # managed policy the statements of its default version. Entries are added as
+    # they stream in, and resolve() runs once everything has been read, since
+    # managed policies come after the principals that attach them
+    def __init__(self, actions=PAM_ACTIONS):
+        self.actions = actions
+        self.users = {}
+        self.groups = {}
+        self.roles = {}
+        self.managed_policies = {}
+        self.resource_arns = set()
+        self._grants = None
+
+    def _record(self, statements):
+        for _, _, resources, _ in statements:
+            self.resource_arns.update(resources)
+        return statements
+
+    def _inline(self, entry, key):
+        statements = []
+        for policy in entry.get(key, []):
+            statements += policy_statements(policy['PolicyDocument'], self.actions)
+        return self._record(statements)
+
+    def add(self, section, entry):
+        self._grants = None
+        attached = tuple(policy['PolicyArn'] for policy in entry.get('AttachedManagedPolicies', []))
+
+        if section == 'UserDetailList':
+            self.users[entry['UserName']] = {
+                'Arn': entry['Arn'], 'Path': entry.get('Path', '/'), 'Groups': tuple(entry.get('GroupList', [])),
+                'Statements': self._inline(entry, 'UserPolicyList'), 'Attached': attached}
+        elif section == 'GroupDetailList':
+            self.groups[entry['GroupName']] = {'Statements': self._inline(entry, 'GroupPolicyList'), 'Attached': attached}
+        elif section == 'RoleDetailList':
+            self.roles[entry['RoleName']] = {
+                'Arn': entry['Arn'], 'Path': entry.get('Path', '/'),
+                'Trusted': _trusted_principals(entry.get('AssumeRolePolicyDocument', {})),
+                'Statements': self._inline(entry, 'RolePolicyList'), 'Attached': attached}
+        elif section == 'Policies':
+            for version in entry.get('PolicyVersionList', []):
+                if version.get('IsDefaultVersion') or version.get('VersionId') == entry.get('DefaultVersionId'):
+                    self.managed_policies[entry['Arn']] = self._record(policy_statements(version['Document'], self.actions))
+                    break
+
+    def resources(self):
+        # Typed resources: every role, plus every concrete ARN a statement names
+        typed = {role['Arn']: 'IAMRole' for role in self.roles.values()}
+        for arn in self.resource_arns:
+            if '*' not in arn and '?' not in arn and resource_type(arn) is not None:
+                typed.setdefault(arn, resource_type(arn))
+        return typed
+
+    def _statement_grants(self, statements, resources_by_type):
+        # (action, ARN) pairs some statement allows and none denies; an explicit
+        # Deny overrides any number of Allows, as in IAM policy evaluation
+        allowed = set()
+        denied = set()
+        for effect, actions, patterns, not_resource in statements:
+            pairs = allowed if effect == 'Allow' else denied
+            for action in actions:
+                candidates = resources_by_type.get(ACTION_RESOURCE_TYPES[action], set())
+                matched = set()
+                for pattern in patterns:
+                    if '*' in pattern or '?' in pattern:
+                        matched.update(arn for arn in candidates if fnmatchcase(arn, pattern))
+                    elif pattern in candidates:
+                        matched.add(pattern)
+                pairs.update((action, arn) for arn in (candidates - matched if not_resource else matched))
+        return allowed - denied
+
+    def resolve(self):
+        # {('user' | 'role', name): {(action, resource ARN)}} with wildcard resource
+        # patterns matched against the known resources of each action's type. A
+        # user's own, group and attached policies are evaluated together, so a Deny
+        # in any of them removes the pair
+        if self._grants is not None:
+            return self._grants
+
+        resources_by_type = {}
+        for arn, res_type in self.resources().items():
+            resources_by_type.setdefault(res_type, set()).add(arn)
+
+        def statements_of(principal):
+            statements = list(principal['Statements'])
+            for policy_arn in principal['Attached']:
+                statements += self.managed_policies.get(policy_arn, [])
+            return statements
+
+        grants = {}
+        for name, user in self.users.items():
+            statements = statements_of(user)
+            for group in user['Groups']:
+                if group in self.groups:
+                    statements += statements_of(self.groups[group])
+            grants[('user', name)] = self._statement_grants(statements, resources_by_type)
+        for name, role in self.roles.items():
+            grants[('role', name)] = self._statement_grants(statements_of(role), resources_by_type)
+
+        # Roles each trusted principal can assume, in role order
+        self._trusting = {}
+        for name, role in self.roles.items():
+            for principal in role['Trusted']:
+                self._trusting.setdefault(principal, []).append(name)
+
+        self._grants = grants
+        return grants
+
+    def assumable_roles(self, user_name):
+        # Roles whose trust policy names the user, its account root or everyone
+        self.resolve()
+        user_arn = self.users[user_name]['Arn']
+        account = account_of(user_arn)
+        names = set()
+        for principal in (user_arn, '*', account, f'arn:aws:iam::{account}:root'):
+            names.update(self._trusting.get(principal, ()))
+        return [name for name in self.roles if name in names]
+
+    def user_actions(self, user_name):
+        # Tracked actions a user holds directly or through a role it can assume
+        grants = self.resolve()
+        actions = {action for action, _ in grants[('user', user_name)]}
+        for role in self.assumable_roles(user_name):
+            actions.update(action for action, _ in grants[('role', role)])
+        return actions
+
+    def abac_model(self):
+        # (users, roles, resources, policies, G) as returned by the ABAC generators.
+        # Every IAM role is a Role node whose permissions are its tracked actions,
+        # and each user's own policies form one more role. Role -> resource edges
+        # follow the grants, and an IAMRole resource leads to the role it names, so
+        # the user -> role -> IAMRole -> role escalation chain is the real one
+        grants = self.resolve()
+        resources = {f'Resource_{arn}': res_type for arn, res_type in self.resources().items()}
+        users = {f'User_{name}': {'Path': user['Path']} for name, user in self.users.items()}
+        roles = {}
+        policies = {}
+        G = nx.DiGraph()
+
+        def add_role(role, role_grants):
+            roles[role] = {'Permissions': sorted({action for action, _ in role_grants})}
+            G.add_node(role, type='Role', permissions=roles[role]['Permissions'])
+            for _, arn in sorted(role_grants):
+                G.add_edge(role, f'Resource_{arn}')
+
+        for resource, res_type in resources.items():
+            G.add_node(resource, type=res_type)
+        for name in self.roles:
+            add_role(f'Role_{name}', grants[('role', name)])
+        for name, role in self.roles.items():
+            G.add_edge(f"Resource_{role['Arn']}", f'Role_{name}')
+
+        for name in self.users:
+            user = f'User_{name}'
+            G.add_node(user, type='User')
+            policies[user] = [f'Role_{role}' for role in self.assumable_roles(name)]
+            if grants[('user', name)]:
+                own_role = f'Role_UserPolicies_{name}'
+                add_role(own_role, grants[('user', name)])
+                policies[user].append(own_role)
+            for role in policies[user]:
+                G.add_edge(user, role)
+
+        return users, roles, resources, policies, G
+
+    def _ngac_entities(self):
+        # User and resource attribute keys never coincide, so in shared attribute
+        # mode no attribute node is both a user's and a resource's; one would
+        # otherwise lead every user to every resource of the account
+        users = {f'User_{name}': {'Path': user['Path'], 'UserAccount': account_of(user['Arn'])}
+                 for name, user in self.users.items()}
+        resources = {f'Resource_{arn}': {'ResourceType': arn.split(':')[2].upper(), 'ResourceAccount': account_of(arn)}
+                     for arn in self.resources()}
+        return users, resources
+
+    def ngac_dag_model(self, backend='networkx', attributes='shared'):
+        # (users, resources, permissions, policy_classes, G) with the NGAC DAG
+        # layers of ngac-dag-full-model.py already built: user -> attribute,
+        # attribute -> resource, user -> permission for the actions a user holds
+        # (directly or through an assumable role), permission -> resource for the
+        # granted pairs, and resource -> policy class by service
+        users, resources = self._ngac_entities()
+        grants = self.resolve()
+        user_actions = {f'User_{name}': self.user_actions(name) for name in self.users}
+        held = set().union(*user_actions.values())
+        permissions = [action for action in self.actions if action in held]
+
+        # Grants of every principal some user acts as
+        permission_resources = set()
+        assumed = set()
+        for name in self.users:
+            permission_resources |= grants[('user', name)]
+            assumed.update(self.assumable_roles(name))
+        for name in assumed:
+            permission_resources |= grants[('role', name)]
+
+        G = nx.DiGraph() if backend == 'networkx' else CSRGraphBuilder()
+        attribute_table = AttributeTable(attributes)
+
+        for user, data in users.items():
+            G.add_node(user, type='User')
+            for key, value in data.items():
+                attribute_node = attribute_table.node(user, key, value)
+                G.add_node(attribute_node, type='UserAttribute')
+                G.add_edge(user, attribute_node)
+        for resource, data in resources.items():
+            G.add_node(resource, type='Resource')
+            for key, value in data.items():
+                attribute_node = attribute_table.node(resource, key, value)
+                G.add_node(attribute_node, type='ResourceAttribute')
+                G.add_edge(attribute_node, resource)
+        for permission in permissions:
+            G.add_node(permission, type='Permission')
+        for policy_class in POLICY_CLASSES:
+            G.add_node(policy_class, type='PolicyClass')
+
+        for user, actions in user_actions.items():
+            for action in permissions:
+                if action in actions:
+                    G.add_edge(user, action)
+        for action, arn in sorted(permission_resources):
+            G.add_edge(action, f'Resource_{arn}')
+        for resource, data in resources.items():
+            if data['ResourceType'] in POLICY_CLASSES:
+                G.add_edge(resource, data['ResourceType'])
+
+        if isinstance(G, CSRGraphBuilder):
+            G = G.to_graph()
+
+        return users, resources, permissions, list(POLICY_CLASSES), G
+
+    def hypergraph_incidence(self, attributes='per_entity'):
+        # (users, resources, permissions, policy_classes, incidence) as returned by
+        # generate_ngac_incidence. Each grant is a (principal, action, resource)
+        # hyperedge, and a (user, role) hyperedge links a user to each role it can
+        # assume, so role grants are not repeated per user. Attribute, permission ->
+        # resource and resource -> policy class edges follow as in the generators
+        users, resources = self._ngac_entities()
+        grants = self.resolve()
+        incidence = IncidenceBuilder()
+        attribute_table = AttributeTable(attributes)
+        edge_count = 0
+
+        permission_resources = set()
+        assumed = []
+        for name in self.users:
+            user = f'User_{name}'
+            for action, arn in sorted(grants[('user', name)]):
+                incidence.add_edge(f"Edge_User_{edge_count}", (user, action, f'Resource_{arn}'))
+                edge_count += 1
+            permission_resources |= grants[('user', name)]
+            for role in self.assumable_roles(name):
+                incidence.add_edge(f"Edge_{edge_count}", (user, f'Role_{role}'))
+                edge_count += 1
+                assumed.append(role)
+            for key, value in users[user].items():
+                incidence.add_edge(f"Edge_{edge_count}", (user, attribute_table.node(user, key, value)))
+                edge_count += 1
+
+        for name in dict.fromkeys(assumed):
+            for action, arn in sorted(grants[('role', name)]):
+                incidence.add_edge(f"Edge_{edge_count}", (f'Role_{name}', action, f'Resource_{arn}'))
+                edge_count += 1
+            permission_resources |= grants[('role', name)]
+
+        for resource, data in resources.items():
+            for key, value in data.items():
+                incidence.add_edge(f"Edge_{edge_count}", (attribute_table.node(resource, key, value), resource))
+                edge_count += 1
+
+        for action, arn in sorted(permission_resources):
+            incidence.add_edge(f"Edge_{edge_count}", (action, f'Resource_{arn}'))
+            edge_count += 1
+        for resource, data in resources.items():
+            if data['ResourceType'] in POLICY_CLASSES:
+                incidence.add_edge(f"Edge_{edge_count}", (resource, data['ResourceType']))
+                edge_count += 1
+
+        held = {action for action, _ in permission_resources}
+        permissions = [action for action in self.actions if action in held]
+        return users, resources, permissions, list(POLICY_CLASSES), incidence.to_incidence()
+
+async def load_authorization_details(path, actions=PAM_ACTIONS, chunk_size=1 << 20):
+    inventory = IAMInventory(actions)
+    async for section, entry in iter_authorization_details(path, chunk_size):
+        inventory.add(section, entry)
+    return inventory
+
+def read_authorization_details(path, actions=PAM_ACTIONS, chunk_size=1 << 20):
+    # Synchronous entry point for the simulation scripts
+    return asyncio.run(load_authorization_details(path, actions, chunk_size))
+
+def generate_authorization_details(num_users, num_roles, num_policies, num_resources, account_id='123456789012',
+                                   rng=None):
+    # Yields (section, entry) for a synthetic account authorization details export,
+    # in the order iter_authorization_details reads a real one. Policies mix
+    # tracked and untracked actions, wildcard and concrete resources, and dict and
+    # URL-encoded documents, as real exports do
+    rng = make_rng(rng)
+    extra_actions = ['s3:GetObject', 'ec2:DescribeInstances', 'kms:Decrypt', 'rds:DescribeDBInstances', 'iam:*', 's3:*']
+
+    role_arns = [f'arn:aws:iam::{account_id}:role/app-role-{i}' for i in range(num_roles)]
+    user_arns = [f'arn:aws:iam::{account_id}:user/user-{i}' for i in range(num_users)]
+    resource_arns = []
+    for i in range(num_resources):
+        service = rng.choice(['ec2', 's3', 'kms', 'rds'])
+        if service == 'ec2':
+            resource_arns.append(f'arn:aws:ec2:us-east-1:{account_id}:instance/i-{i:017x}')
+        elif service == 's3':
+            resource_arns.append(f'arn:aws:s3:::bucket-{i}')
+        elif service == 'kms':
+            resource_arns.append(f'arn:aws:kms:us-east-1:{account_id}:key/{i:08x}')
+        else:
+            resource_arns.append(f'arn:aws:rds:us-east-1:{account_id}:db:db-{i}')
+    policy_arns = [f'arn:aws:iam::{account_id}:policy/pam-policy-{i}' for i in range(num_policies)]
+    group_names = [f'group-{i}' for i in range(max(1, num_users // 50))]
+
+    def document():
+        statements = []
+        for _ in range(rng.randint(1, 3)):
+            actions = rng.sample(PAM_ACTIONS + extra_actions, rng.randint(1, 3))
+            resources = rng.choice([
+                ['*'], [f'arn:aws:iam::{account_id}:role/app-role-*'],
+                rng.sample(role_arns, min(len(role_arns), rng.randint(1, 3))),
+                rng.sample(resource_arns, min(len(resource_arns), rng.randint(1, 5)))])
+            statements.append({'Effect': rng.choice(['Allow', 'Allow', 'Allow', 'Deny']), 'Action': actions,
+                               'Resource': resources})
+        policy = {'Version': '2012-10-17', 'Statement': statements}
+        # Some exports keep documents URL-encoded
+        return json.dumps(policy).replace(' ', '%20').replace('"', '%22') if rng.random() < 0.1 else policy
+
+    def attached():
+        return [{'PolicyName': arn.rsplit('/', 1)[1], 'PolicyArn': arn}
+                for arn in rng.sample(policy_arns, min(len(policy_arns), rng.randint(0, 2)))]
+
+    def trust():
+        principals = rng.sample(user_arns, min(len(user_arns), rng.randint(1, 4)))
+        if rng.random() < 0.05:
+            principals.append(f'arn:aws:iam::{account_id}:root')
+        return {'Version': '2012-10-17', 'Statement': [
+            {'Effect': 'Allow', 'Principal': {'AWS': principals}, 'Action': 'sts:AssumeRole'}]}
+
+    sections = {
+        'UserDetailList': ({'Path': '/', 'UserName': f'user-{i}', 'UserId': f'AIDA{i:016d}', 'Arn': arn,
+                            'GroupList': rng.sample(group_names, rng.randint(0, min(2, len(group_names)))),
+                            'UserPolicyList': [{'PolicyName': f'inline-{i}', 'PolicyDocument': document()}]
+                            if rng.random() < 0.3 else [],
+                            'AttachedManagedPolicies': attached()}
+                           for i, arn in enumerate(user_arns)),
+        'GroupDetailList': ({'Path': '/', 'GroupName': name, 'Arn': f'arn:aws:iam::{account_id}:group/{name}',
+                             'GroupPolicyList': [], 'AttachedManagedPolicies': attached()}
+                            for name in group_names),
+        'RoleDetailList': ({'Path': '/', 'RoleName': arn.rsplit('/', 1)[1], 'Arn': arn,
+                            'AssumeRolePolicyDocument': trust(),
+                            'RolePolicyList': [{'PolicyName': f'role-inline-{i}', 'PolicyDocument': document()}],
+                            'AttachedManagedPolicies': attached(), 'InstanceProfileList': []}
+                           for i, arn in enumerate(role_arns)),
+        'Policies': ({'PolicyName': arn.rsplit('/', 1)[1], 'Arn': arn, 'DefaultVersionId': 'v2',
+                      'PolicyVersionList': [{'Document': document(), 'VersionId': 'v2', 'IsDefaultVersion': True},
+                                            {'Document': document(), 'VersionId': 'v1', 'IsDefaultVersion': False}]}
+                     for arn in policy_arns),
+    }
+
+    for section, entries in sections.items():
+        for entry in entries:
+            yield section, entry
+
+def write_authorization_details(path, num_users, num_roles, num_policies, num_resources, account_id='123456789012',
+                                rng=None):
+    # Writes a generated export for offline tests, one entry at a time so fixtures
+    # of any size can be written
+    entries = generate_authorization_details(num_users, num_roles, num_policies, num_resources, account_id, rng)
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as file:
+        file.write('{')
+        current = None
+        for section, entry in entries:
+            if section == current:
+                file.write(',\n')
+            else:
+                if current is not None:
+                    file.write('\n], ')
+                file.write(f'"{section}": [\n')
+                current = section
+            file.write(json.dumps(entry))
+        if current is not None:
+            file.write('\n], ')
+        file.write('"IsTruncated": false}\n')
+
+    return path
+
+def generate_inventory(num_users, num_roles, num_policies, num_resources, account_id='123456789012', rng=None):
+    # IAMInventory of a generated export, without writing it out
+    inventory = IAMInventory()
+    for section, entry in generate_authorization_details(num_users, num_roles, num_policies, num_resources, account_id,
+                                                         rng):
+        inventory.add(section, entry)
+    return inventory
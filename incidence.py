@@ -0,0 +1,195 @@
+from array import array
+from collections import namedtuple
+
+import hypernetx as hnx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Hypergraph incidence as parallel (edge_id, node_id) integer arrays, with the
+# edge and node names in H.edges / H.nodes order
+Incidence = namedtuple('Incidence', ['edge_names', 'node_names', 'edge_ids', 'node_ids'])
+
+
+class IncidenceBuilder:
+    # Collects hyperedges as parallel (edge_id, node_id) arrays while a model is
+    # generated, interning node names to integer IDs as they arrive, instead of a
+    # {edge name: member set} dict that the hypergraph backend has to re-parse
+    def __init__(self):
+        self.node_ids = {}
+        self.node_names = []
+        self.edge_names = []
+        self.edge_ids = array('i')
+        self.member_ids = array('i')
+
+    def _intern(self, node):
+        node_id = self.node_ids.get(node)
+        if node_id is None:
+            node_id = len(self.node_names)
+            self.node_ids[node] = node_id
+            self.node_names.append(node)
+        return node_id
+
+    def add_edge(self, name, members):
+        edge_id = len(self.edge_names)
+        self.edge_names.append(name)
+        for member in members:
+            self.edge_ids.append(edge_id)
+            self.member_ids.append(self._intern(member))
+
+    def add_edges(self, names, *member_columns):
+        # One edge per name, edge i holding member i of every column; a column can
+        # also be a single node shared by all of the edges
+        first = len(self.edge_names)
+        self.edge_names.extend(names)
+        count = len(self.edge_names) - first
+
+        columns = []
+        for column in member_columns:
+            if isinstance(column, str):
+                columns.append(np.full(count, self._intern(column), dtype=np.int32))
+            else:
+                columns.append(np.array([self._intern(member) for member in column], dtype=np.int32))
+
+        self.edge_ids.frombytes(np.repeat(np.arange(first, first + count, dtype=np.int32), len(columns)).tobytes())
+        self.member_ids.frombytes(np.column_stack(columns).ravel().tobytes())
+
+    def to_incidence(self):
+        return Incidence(self.edge_names, self.node_names, np.frombuffer(self.edge_ids, dtype=np.int32),
+                         np.frombuffer(self.member_ids, dtype=np.int32))
+
+
+def incidence_from_hypergraph(H):
+    edge_names = list(H.edges)
+    node_names = list(H.nodes)
+    node_index = {node: i for i, node in enumerate(node_names)}
+
+    incidence = H.incidence_dict
+    edge_ids = []
+    node_ids = []
+    for edge_id, edge_key in enumerate(edge_names):
+        for member in incidence.get(edge_key, ()):
+            edge_ids.append(edge_id)
+            node_ids.append(node_index[member])
+
+    return Incidence(edge_names, node_names, np.array(edge_ids, dtype=np.int32), np.array(node_ids, dtype=np.int32))
+
+def hypergraph_from_incidence(incidence):
+    edge_names = np.array(incidence.edge_names, dtype=object)
+    node_names = np.array(incidence.node_names, dtype=object)
+    pairs = pd.DataFrame({'edges': edge_names[incidence.edge_ids], 'nodes': node_names[incidence.node_ids]})
+    return hnx.Hypergraph(pairs)
+
+def incidence_matrix(incidence):
+    # Sparse boolean node x edge incidence matrix
+    data = np.ones(len(incidence.node_ids), dtype=bool)
+    return sparse.csr_matrix((data, (incidence.node_ids, incidence.edge_ids)),
+                             shape=(len(incidence.node_names), len(incidence.edge_names)))
+
+def edge_members(incidence, edge_id, edge_offsets=None):
+    # Member names of one edge, in the order they appear in the incidence
+    # (the order of H.incidence_dict for an incidence read from hypernetx)
+    if edge_offsets is None:
+        edge_offsets = np.searchsorted(incidence.edge_ids, np.arange(len(incidence.edge_names) + 1))
+    node_names = incidence.node_names
+    return [node_names[i] for i in incidence.node_ids[edge_offsets[edge_id]:edge_offsets[edge_id + 1]].tolist()]
+
+def policy_class_hits(incidence, name_pattern, policy_class_nodes, matrix=None, rows=None):
+    # Set-theoretic form of the hypernetx detectors' single-edge check: the rows of
+    # every node whose name contains name_pattern (or the given rows), intersected
+    # with the columns of the edges that touch a policy class. Returns {node:
+    # members of its last such edge} and {node: number of such edges}; the hit
+    # counts sum to the traversal count
+    if matrix is None:
+        matrix = incidence_matrix(incidence)
+
+    node_names = np.array(incidence.node_names, dtype=str)
+    policy_class_rows = np.flatnonzero(np.isin(node_names, list(policy_class_nodes)))
+    policy_class_edges = np.flatnonzero(matrix[policy_class_rows].getnnz(axis=0))
+    if rows is None:
+        rows = np.flatnonzero(np.char.find(node_names, name_pattern) >= 0)
+
+    hits = matrix[rows][:, policy_class_edges]
+    hits.sort_indices()
+    counts = np.diff(hits.indptr)
+    hit_rows = np.flatnonzero(counts)
+    last_edges = policy_class_edges[hits.indices[hits.indptr[hit_rows + 1] - 1]]
+
+    # Edges are stored edge-major, so each edge's members are one contiguous slice
+    edge_offsets = np.searchsorted(incidence.edge_ids, np.arange(len(incidence.edge_names) + 1))
+    members = {}
+    escalation_paths = {}
+    hit_counts = {}
+    for row, edge_id, count in zip(rows[hit_rows].tolist(), last_edges.tolist(), counts[hit_rows].tolist()):
+        if edge_id not in members:
+            members[edge_id] = edge_members(incidence, edge_id, edge_offsets)
+        node = incidence.node_names[row]
+        escalation_paths[node] = members[edge_id]
+        hit_counts[node] = count
+
+    return escalation_paths, hit_counts
+
+def policy_class_paths(incidence, sources, policy_class_nodes, max_depth, layers):
+    # Shortest escalation paths of up to max_depth hyperedges from every source
+    # node to a policy class, found for all sources at once. layers lists the node
+    # collections a path passes through in order, e.g. [users, permissions,
+    # resources], with the policy classes after the last one; a hop through a
+    # hyperedge must move to a later layer, so paths only run user -> permission
+    # -> resource -> policy class, and nodes in no layer (attributes) are never
+    # traversed. The search runs outward from the policy classes level by level:
+    # each hyperedge touching the frontier is expanded from its latest-layer
+    # frontier member and reaches its unreached members in earlier layers. Returns
+    # {source: [node, edge, node, ..., policy class]} for the sources that reach a
+    # policy class and the number of edges expanded
+    node_ids, edge_ids = incidence.node_ids, incidence.edge_ids
+    num_nodes, num_edges = len(incidence.node_names), len(incidence.edge_names)
+    node_index = {node: i for i, node in enumerate(incidence.node_names)}
+
+    rank = np.full(num_nodes, -1, dtype=np.int32)
+    for layer, nodes in enumerate(list(layers) + [policy_class_nodes]):
+        rank[[node_index[node] for node in nodes if node in node_index]] = layer
+    member_rank = rank[node_ids]
+
+    distance = np.full(num_nodes, -1, dtype=np.int32)
+    via_edge = np.full(num_nodes, -1, dtype=np.int32)
+    # For each reached node, the member of via_edge one hop closer to a policy class
+    via_next = np.full(num_nodes, -1, dtype=np.int32)
+    # Latest layer each edge has been expanded from
+    expanded_rank = np.full(num_edges, -1, dtype=np.int32)
+
+    frontier = rank == len(layers)
+    distance[frontier] = 0
+
+    for depth in range(1, max_depth + 1):
+        touching = np.flatnonzero(frontier[node_ids])
+        edge_rank = np.full(num_edges, -1, dtype=np.int32)
+        np.maximum.at(edge_rank, edge_ids[touching], member_rank[touching])
+        new_edges = edge_rank > expanded_rank
+        if not new_edges.any():
+            break
+        edge_next = np.full(num_edges, -1, dtype=np.int32)
+        from_latest = touching[member_rank[touching] == edge_rank[edge_ids[touching]]]
+        edge_next[edge_ids[from_latest]] = node_ids[from_latest]
+        expanded_rank = np.where(new_edges, edge_rank, expanded_rank)
+
+        reached = (new_edges[edge_ids] & (member_rank >= 0) & (member_rank < edge_rank[edge_ids])
+                   & (distance[node_ids] < 0))
+        distance[node_ids[reached]] = depth
+        via_edge[node_ids[reached]] = edge_ids[reached]
+        via_next[node_ids[reached]] = edge_next[edge_ids[reached]]
+        frontier = np.zeros(num_nodes, dtype=bool)
+        frontier[node_ids[reached]] = True
+
+    paths = {}
+    for source in sources:
+        node = node_index.get(source)
+        if node is None or distance[node] < 0:
+            continue
+        path = [source]
+        while distance[node] > 0:
+            path.append(incidence.edge_names[via_edge[node]])
+            node = via_next[node]
+            path.append(incidence.node_names[node])
+        paths[source] = path
+
+    return paths, int((expanded_rank >= 0).sum())
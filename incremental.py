@@ -0,0 +1,166 @@
+from collections import deque
+
+import networkx as nx
+
+from escalation import role_chain_cache
+from reachability import compute_policy_class_reachability, node_policy_class_distances
+
+
+def _users_above(G, node, depth):
+    # Users among node and its ancestors up to depth reverse hops
+    users = set()
+    frontier = {node}
+    seen = {node}
+    for _ in range(depth + 1):
+        next_frontier = set()
+        for current in frontier:
+            if G.nodes[current]['type'] == 'User':
+                users.add(current)
+            for predecessor in G.predecessors(current):
+                if predecessor not in seen:
+                    seen.add(predecessor)
+                    next_frontier.add(predecessor)
+        frontier = next_frontier
+    return users
+
+def abac_user_escalation(G, user, cache=None):
+    # The user -> role -> IAMRole -> role chain of detect_privilege_escalation for a
+    # single user, returning the same (last found) witness or None
+    if cache is None:
+        cache = role_chain_cache(G)
+    witness = None
+    for role in G.successors(user):
+        if G.nodes[role]['type'] == 'Role':
+            role_witness = cache.get(role)[0]
+            if role_witness is not None:
+                witness = role_witness
+    return witness
+
+
+class IncrementalABACDetector:
+    # Keeps escalation_paths for an ABAC graph current under user-role,
+    # role-resource and resource-role edge changes and role permission changes,
+    # re-evaluating only the users whose chains can pass through the change. Role
+    # chains come from a role_chain_cache, which each change invalidates
+    def __init__(self, G):
+        self.G = G
+        self.cache = role_chain_cache(G)
+        self.escalation_paths = {}
+        self.recompute()
+
+    def recompute(self):
+        self.escalation_paths = {}
+        for user in [n for n, d in self.G.nodes(data=True) if d['type'] == 'User']:
+            self._evaluate(user)
+        return self.escalation_paths
+
+    def _evaluate(self, user):
+        witness = abac_user_escalation(self.G, user, self.cache)
+        if witness is None:
+            self.escalation_paths.pop(user, None)
+        else:
+            self.escalation_paths[user] = witness
+
+    def _refresh(self, users):
+        for user in users:
+            self._evaluate(user)
+        return users
+
+    def add_assignment(self, u, v):
+        self.G.add_edge(u, v)
+        self.cache.edge_changed(u, v)
+        # An edge out of u sits at most two hops below the user it affects
+        return self._refresh(_users_above(self.G, u, 2))
+
+    def remove_assignment(self, u, v):
+        self.G.remove_edge(u, v)
+        self.cache.edge_changed(u, v)
+        return self._refresh(_users_above(self.G, u, 2))
+
+    def set_role_permissions(self, role, permissions):
+        self.G.nodes[role]['permissions'] = list(permissions)
+        self.cache.node_changed(role)
+        # A role is either the first hop or the last hop (three below the user)
+        return self._refresh(_users_above(self.G, role, 3))
+
+
+class IncrementalNGACDetector:
+    # Keeps the policy-class reachability table and escalation_paths of an NGAC
+    # DAG current under edge changes. On a DAG, changes propagate from the edge's
+    # source to predecessors only while a node's distances actually change. While
+    # the graph has a cycle, the source and all its ancestors are recomputed
+    # instead, and each removal rechecks whether the cycle is gone
+    def __init__(self, G):
+        self.G = G
+        self.recompute()
+
+    def recompute(self):
+        self.acyclic = nx.is_directed_acyclic_graph(self.G)
+        self.reachability = compute_policy_class_reachability(self.G)
+        self.escalation_paths = {}
+        self.user_path_lengths = {}
+        for user in [n for n, d in self.G.nodes(data=True) if d['type'] == 'User']:
+            self._evaluate(user)
+        return self.escalation_paths
+
+    def _evaluate(self, user):
+        self.user_path_lengths.pop(user, None)
+        self.escalation_paths.pop(user, None)
+        for policy_class, distance in self.reachability[user].items():
+            self.escalation_paths[user] = policy_class
+            self.user_path_lengths.setdefault(user, []).append(distance)
+
+    def path_complexity(self):
+        path_lengths = [length for lengths in self.user_path_lengths.values() for length in lengths]
+        return sum(path_lengths) / len(path_lengths) if path_lengths else 0
+
+    def _propagate(self, source):
+        changed = set()
+        worklist = deque([source])
+        queued = {source}
+        while worklist:
+            node = worklist.popleft()
+            queued.discard(node)
+            node_distances = node_policy_class_distances(self.G, node, self.reachability)
+            if node_distances != self.reachability.get(node):
+                self.reachability[node] = node_distances
+                changed.add(node)
+                for predecessor in self.G.predecessors(node):
+                    if predecessor not in queued:
+                        queued.add(predecessor)
+                        worklist.append(predecessor)
+        return changed
+
+    def _refresh(self, u, v):
+        if v in self.G and v not in self.reachability:
+            self.reachability[v] = node_policy_class_distances(self.G, v, self.reachability)
+
+        if self.acyclic:
+            changed = self._propagate(u)
+        else:
+            changed = nx.ancestors(self.G, u) | {u}
+            compute_policy_class_reachability(self.G, nodes=changed, reachability=self.reachability)
+
+        users = {node for node in changed if self.G.nodes[node]['type'] == 'User'}
+        for user in users:
+            self._evaluate(user)
+        return users
+
+    def add_assignment(self, u, v, u_type=None, v_type=None):
+        # New endpoints need a type, as with G.add_node(node, type=...)
+        if u_type is not None:
+            self.G.add_node(u, type=u_type)
+        if v_type is not None:
+            self.G.add_node(v, type=v_type)
+        if self.acyclic and v in self.G and (u == v or nx.has_path(self.G, v, u)):
+            self.acyclic = False
+        self.G.add_edge(u, v)
+        return self._refresh(u, v)
+
+    def remove_assignment(self, u, v):
+        self.G.remove_edge(u, v)
+        # Only a removal can break a cycle; the reachability table is exact either
+        # way, so propagation can resume from here once the graph is a DAG again
+        if not self.acyclic:
+            self.acyclic = nx.is_directed_acyclic_graph(self.G)
+        return self._refresh(u, v)
@@ -1,46 +1,59 @@
-import random
 import time
 import csv
+from functools import partial
 import networkx as nx
+from attributes import AttributeTable
+from csr_graph import CSRGraphBuilder
+from footprint import memory_footprint
+from incremental import IncrementalNGACDetector
+from profiling import profile_session
+from reachability import compute_policy_class_reachability
+from snapshot import load_or_generate
+from sweep import load_row_configuration, make_rng, write_sweep
+from timing import TIMING_HEADER, PhaseTimer
 
 traversal_count = 0
 
 
-def generate_ngac_model(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions):
+def generate_ngac_model(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                        backend='networkx', rng=None, attributes='shared'):
+    rng = make_rng(rng)
+
     all_permissions = [
         'iam:PassRole', 'ec2:RunInstances', 's3:PutObject',
         'iam:AttachRolePolicy', 'iam:UpdateRole', 'iam:UpdateAssumeRolePolicy'
     ]
 
     users = {f"User_{i}": {
-        'UserType': random.choice(['Admin', 'User', 'Service']),
-        'AuthType': random.choice(['Password', 'MFA', 'Federated'])
+        'UserType': rng.choice(['Admin', 'User', 'Service']),
+        'AuthType': rng.choice(['Password', 'MFA', 'Federated'])
     } for i in range(num_users)}
 
     resources = {f"Resource_{i}": {
-        'LeastPrivilegePolicy': random.choice(['Strict', 'Relaxed']),
-        'ResourceType': random.choice(['EC2', 'S3', 'KMS', 'RDS']),
-        'IsCreateModify': random.choice(['True', 'False'])
+        'LeastPrivilegePolicy': rng.choice(['Strict', 'Relaxed']),
+        'ResourceType': rng.choice(['EC2', 'S3', 'KMS', 'RDS']),
+        'IsCreateModify': rng.choice(['True', 'False'])
     } for i in range(num_resources)}
 
-    permissions = random.choices(all_permissions, k=num_permissions)
+    permissions = rng.choices(all_permissions, k=num_permissions)
 
     policy_classes = ['IAM', 'EC2', 'S3', 'KMS', 'RDS']
 
-    G = nx.DiGraph()
+    G = nx.DiGraph() if backend == 'networkx' else CSRGraphBuilder()
+    attribute_table = AttributeTable(attributes)
 
     # Add Users, Resources, User-Attributes, Resource-Attributes, Permissions, and Policy Classes to Graph
     for user, data in users.items():
         G.add_node(user, type='User')
         for key, value in data.items():
-            attribute_node = f'{key}:{value}'
+            attribute_node = attribute_table.node(user, key, value)
             G.add_node(attribute_node, type='UserAttribute')
             G.add_edge(user, attribute_node)
 
     for resource, data in resources.items():
         G.add_node(resource, type='Resource')
         for key, value in data.items():
-            attribute_node = f'{key}:{value}'
+            attribute_node = attribute_table.node(resource, key, value)
             G.add_node(attribute_node, type='ResourceAttribute')
             G.add_edge(attribute_node, resource)
 
@@ -67,20 +80,25 @@ def build_ngac_policy_dag(G, users, resources, permissions, policy_classes):
         for resource in resources:
             G.add_edge(resource, policy_class)
 
+    if isinstance(G, CSRGraphBuilder):
+        G = G.to_graph()
+
     return G
 
-def detect_privilege_escalation(G):
+def detect_privilege_escalation(G, reachability=None):
     global traversal_count
     traversal_count = 0
     escalation_paths = {}
     path_lengths = []
 
+    if reachability is None:
+        reachability = compute_policy_class_reachability(G)
+
     for user in [n for n, d in G.nodes(data=True) if d['type'] == 'User']:
-        for successor in nx.descendants(G, user):
-            if G.nodes[successor]['type'] == 'PolicyClass':
-                traversal_count += 1
-                escalation_paths[user] = successor
-                path_lengths.append(nx.shortest_path_length(G, user, successor))
+        for policy_class, distance in reachability[user].items():
+            traversal_count += 1
+            escalation_paths[user] = policy_class
+            path_lengths.append(distance)
 
     if len(path_lengths) > 0:
         path_complexity = sum(path_lengths) / len(path_lengths)
@@ -89,39 +107,114 @@ def detect_privilege_escalation(G):
 
     return escalation_paths, path_complexity, traversal_count
 
-def run_ngac_simulation(log_ranges, repetitions=10):
-    results = []
+def generate_policy_graph(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                          backend='networkx', seed=None, attributes='shared'):
+    users, resources, permissions, policy_classes, G = generate_ngac_model(
+        num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, backend, rng=seed,
+        attributes=attributes)
+    G = build_ngac_policy_dag(G, users, resources, permissions, policy_classes)
 
-    for _ in range(repetitions):
-        for num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions in log_ranges:
+    model = {'users': users, 'resources': resources, 'permissions': permissions, 'policy_classes': policy_classes}
+    return model, G
 
-            start_time = time.time()
-            users, resources, permissions, policy_classes, G = generate_ngac_model(
-                num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions)
-            build_time = time.time() - start_time
+def run_configuration(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                      backend='networkx', attributes='shared', seed=None, snapshot_dir=None, runs=1, trace_memory=False, profile=None):
+    sizes = (num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions)
+    timer = PhaseTimer(runs, trace_memory, profile_session(profile, sizes, seed))
 
-            G = build_ngac_policy_dag(G, users, resources, permissions, policy_classes)
+    if snapshot_dir is None:
+        users, resources, permissions, policy_classes, model_graph = timer.measure(
+            'Generate', generate_ngac_model, *sizes, backend, rng=seed, attributes=attributes)
 
-            start_time = time.time()
-            detected_paths, path_complexity, traversal_frequency = detect_privilege_escalation(G)
-            detection_time = time.time() - start_time
+        # The build adds edges in place, so every run starts from a fresh copy
+        G = timer.measure('Build', build_ngac_policy_dag,
+                          setup=lambda: (model_graph.copy(), users, resources, permissions, policy_classes))
+    else:
+        # Generate here is the snapshot load (or the first generate and save)
+        snapshot_name = 'ngac_dag_full_model' if attributes == 'shared' else f'ngac_dag_full_model_{attributes}'
+        model, G = timer.measure('Generate', load_or_generate, snapshot_dir, snapshot_name, sizes, seed,
+                                 partial(generate_policy_graph, *sizes, backend, seed, attributes), backend)
+        users = model['users']
 
-            detection_accuracy = len(detected_paths) / max(1, len(users))
-            graph_size = G.number_of_nodes() + G.number_of_edges()
+    detected_paths, path_complexity, traversal_frequency = timer.measure('Detect', detect_privilege_escalation, G)
 
-            results.append([num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
-                            detection_accuracy, path_complexity, traversal_frequency, detection_time, graph_size, build_time])
+    detection_accuracy = len(detected_paths) / max(1, len(users))
+    graph_size = G.number_of_nodes() + G.number_of_edges()
+    graph_memory = memory_footprint(G)
 
+    return [num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+            detection_accuracy, path_complexity, traversal_frequency, timer.seconds('Detect'), graph_size,
+            timer.seconds('Generate') + timer.seconds('Build'), graph_memory] + timer.columns() + [seed]
+
+def run_ngac_simulation(log_ranges, repetitions=10, backend='networkx', attributes='shared', workers=1, seed=None,
+                        snapshot_dir=None, resume=False, compress=False, runs=1, trace_memory=False, profile=None):
     csv_file = '/tmp/ngac_policy_dag_full_model_results.csv'
+    header = ['Num_Users', 'Num_User_Attributes', 'Num_Resources', 'Num_Resource_Attributes', 'Num_Permissions',
+              'Detection_Accuracy', 'Path_Complexity', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size',
+              'Graph_Build_Time', 'Graph_Memory'] + TIMING_HEADER + ['Seed']
+    return write_sweep(csv_file, header, run_configuration, log_ranges, repetitions, workers=workers, seed=seed,
+                       resume=resume, compress=compress, backend=backend, attributes=attributes, snapshot_dir=snapshot_dir, runs=runs,
+                       trace_memory=trace_memory,
+                       profile=profile.for_results(csv_file) if profile is not None else None)
+
+def apply_random_update(detector, users, resources, permissions, policy_classes, rng):
+    # Toggle one random user-permission, permission-resource or resource-policy class assignment
+    G = detector.G
+    kind = rng.choice(['user_permission', 'permission_resource', 'resource_policy_class'])
+
+    if kind == 'user_permission':
+        u, v = rng.choice(users), rng.choice(permissions)
+    elif kind == 'permission_resource':
+        u, v = rng.choice(permissions), rng.choice(resources)
+    else:
+        u, v = rng.choice(resources), rng.choice(policy_classes)
+
+    if G.has_edge(u, v):
+        return detector.remove_assignment(u, v)
+    return detector.add_assignment(u, v)
+
+def run_update_benchmark(log_ranges, num_updates=100, seed=None):
+    rng = make_rng(seed)
+    results = []
+
+    for num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions in log_ranges:
+        model_seed = rng.getrandbits(32)
+        users, resources, permissions, policy_classes, G = generate_ngac_model(
+            num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, rng=model_seed)
+        G = build_ngac_policy_dag(G, users, resources, permissions, policy_classes)
+        detector = IncrementalNGACDetector(G)
+
+        start_time = time.perf_counter()
+        detect_privilege_escalation(G)
+        full_recompute_time = time.perf_counter() - start_time
+
+        update_times = []
+        for _ in range(num_updates):
+            start_time = time.perf_counter()
+            apply_random_update(detector, list(users), list(resources), permissions, policy_classes, rng)
+            update_times.append(time.perf_counter() - start_time)
+
+        results.append([num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, num_updates,
+                        sum(update_times) / len(update_times), max(update_times), full_recompute_time, model_seed])
+
+    csv_file = '/tmp/ngac_policy_dag_incremental_update_results.csv'
     with open(csv_file, mode='w', newline='') as file:
         writer = csv.writer(file)
         writer.writerow(['Num_Users', 'Num_User_Attributes', 'Num_Resources', 'Num_Resource_Attributes', 'Num_Permissions',
-                         'Detection_Accuracy', 'Path_Complexity', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size', 'Graph_Build_Time'])
+                         'Num_Updates', 'Update_Latency', 'Max_Update_Latency', 'Full_Recompute_Latency', 'Seed'])
         for row in results:
             writer.writerow(row)
 
     return csv_file
 
+def replay_model(csv_file, row_number, backend='networkx', attributes='shared'):
+    # Rebuild the exact model and graph behind one CSV row, e.g. to profile a slow case in isolation
+    sizes, seed = load_row_configuration(csv_file, row_number)
+    users, resources, permissions, policy_classes, G = generate_ngac_model(*sizes, backend, rng=seed, attributes=attributes)
+    G = build_ngac_policy_dag(G, users, resources, permissions, policy_classes)
+
+    return users, resources, permissions, policy_classes, G
+
 
 if __name__ == "__main__":
     log_ranges = [
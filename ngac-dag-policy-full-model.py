@@ -1,46 +1,59 @@
-import random
-import time
-import csv
+from functools import partial
 import networkx as nx
+import numpy as np
+from attributes import AttributeTable
+from csr_graph import NODE_TYPE_CODES, CSRGraphBuilder
+from escalation_stream import iter_policy_class_escalations, summarize_escalations
+from evaluation_cache import CACHE_HEADER, measure_with_cache
+from footprint import memory_footprint
+from profiling import profile_session
+from reachability import policy_class_cache, sparse_policy_class_distances
+from snapshot import load_or_generate
+from sweep import load_row_configuration, make_rng, write_sweep
+from timing import TIMING_HEADER, PhaseTimer
 
 traversal_count = 0
 
 
-def generate_ngac_model(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions):
+def generate_ngac_model(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                        backend='networkx', rng=None, attributes='shared'):
+    rng = make_rng(rng)
+
     all_permissions = [
         'iam:PassRole', 'ec2:RunInstances', 's3:PutObject',
         'iam:AttachRolePolicy', 'iam:UpdateRole', 'iam:UpdateAssumeRolePolicy'
     ]
 
     users = {f"User_{i}": {
-        'UserType': random.choice(['Admin', 'User', 'Service']),
-        'AuthType': random.choice(['Password', 'MFA', 'Federated'])
+        'UserType': rng.choice(['Admin', 'User', 'Service']),
+        'AuthType': rng.choice(['Password', 'MFA', 'Federated'])
     } for i in range(num_users)}
 
     resources = {f"Resource_{i}": {
-        'LeastPrivilegePolicy': random.choice(['Strict', 'Relaxed']),
-        'ResourceType': random.choice(['EC2', 'S3', 'KMS', 'RDS']),
-        'IsCreateModify': random.choice(['True', 'False'])
+        'LeastPrivilegePolicy': rng.choice(['Strict', 'Relaxed']),
+        'ResourceType': rng.choice(['EC2', 'S3', 'KMS', 'RDS']),
+        'IsCreateModify': rng.choice(['True', 'False'])
     } for i in range(num_resources)}
 
-    permissions = random.choices(all_permissions, k=num_permissions)
+    permissions = rng.choices(all_permissions, k=num_permissions)
 
     policy_classes = ['IAM', 'EC2', 'S3', 'KMS', 'RDS']
 
-    G = nx.DiGraph()
+    G = nx.DiGraph() if backend == 'networkx' else CSRGraphBuilder()
+    attribute_table = AttributeTable(attributes)
 
     # Add Users, Resources, User-Attributes, Resource-Attributes, Permissions, and Policy Classes to Graph
     for user, data in users.items():
         G.add_node(user, type='User')
         for key, value in data.items():
-            attribute_node = f'{key}:{value}'
+            attribute_node = attribute_table.node(user, key, value)
             G.add_node(attribute_node, type='UserAttribute')
             G.add_edge(user, attribute_node)
 
     for resource, data in resources.items():
         G.add_node(resource, type='Resource')
         for key, value in data.items():
-            attribute_node = f'{key}:{value}'
+            attribute_node = attribute_table.node(resource, key, value)
             G.add_node(attribute_node, type='ResourceAttribute')
             G.add_edge(attribute_node, resource)
 
@@ -67,6 +80,9 @@ def build_ngac_policy_dag(G, users, resources, permissions, policy_classes):
         for resource in resources:
             G.add_edge(resource, policy_class)
 
+    if isinstance(G, CSRGraphBuilder):
+        G = G.to_graph()
+
     return G
 
 def detect_privilege_escalation(G):
@@ -89,35 +105,131 @@ def detect_privilege_escalation(G):
 
     return escalation_paths, path_complexity, traversal_count
 
-def run_ngac_simulation(log_ranges, repetitions=10):
-    results = []
+def detect_privilege_escalation_cached(G, cache=None):
+    # Same counts and path lengths as detect_privilege_escalation, with each node's
+    # policy class distances computed once and reused by every user above it
+    # instead of a descendants search and a shortest path per user
+    global traversal_count
+    traversal_count = 0
+    escalation_paths = {}
+    path_lengths = []
+
+    if cache is None:
+        cache = policy_class_cache(G)
+
+    for user in [n for n, d in G.nodes(data=True) if d['type'] == 'User']:
+        for policy_class, distance in cache.get(user).items():
+            traversal_count += 1
+            escalation_paths[user] = policy_class
+            path_lengths.append(distance)
+
+    if len(path_lengths) > 0:
+        path_complexity = sum(path_lengths) / len(path_lengths)
+    else:
+        path_complexity = 0
+
+    return escalation_paths, path_complexity, traversal_count
 
-    for _ in range(repetitions):
-        for num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions in log_ranges:
+def detect_privilege_escalation_sparse(G):
+    # Same counts and path lengths as detect_privilege_escalation, with every
+    # user's policy class hop counts read off sparse_policy_class_distances
+    global traversal_count
+    node_names, types, policy_classes, distances = sparse_policy_class_distances(G)
 
-            users, resources, permissions, policy_classes, G = generate_ngac_model(
-                num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions)
-            G = build_ngac_policy_dag(G, users, resources, permissions, policy_classes)
+    user_ids = np.flatnonzero(types == NODE_TYPE_CODES['User'])
+    user_distances = distances[user_ids]
+    reached = user_distances >= 0
+    traversal_count = int(reached.sum())
+    path_lengths = user_distances[reached]
 
-            start_time = time.time()
-            detected_paths, path_complexity, traversal_frequency = detect_privilege_escalation(G)
-            detection_time = time.time() - start_time
+    # Each flagged user maps to the last policy class it reaches, in policy class order
+    escalation_paths = {}
+    last_reached = reached.shape[1] - 1 - np.argmax(reached[:, ::-1], axis=1)
+    for row in np.flatnonzero(reached.any(axis=1)).tolist():
+        escalation_paths[node_names[user_ids[row]]] = policy_classes[last_reached[row]]
 
-            detection_accuracy = len(detected_paths) / max(1, len(users))
-            graph_size = G.number_of_nodes() + G.number_of_edges()
+    if len(path_lengths) > 0:
+        path_complexity = int(path_lengths.sum()) / len(path_lengths)
+    else:
+        path_complexity = 0
 
-            results.append([num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
-                            detection_accuracy, path_complexity, traversal_frequency, detection_time, graph_size])
+    return escalation_paths, path_complexity, traversal_count
 
-    csv_file = '/tmp/ngac_policy_dag_full_model_results.csv'
-    with open(csv_file, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['Num_Users', 'Num_User_Attributes', 'Num_Resources', 'Num_Resource_Attributes', 'Num_Permissions',
-                         'Detection_Accuracy', 'Path_Complexity', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size'])
-        for row in results:
-            writer.writerow(row)
+def detect_privilege_escalation_lazy(G):
+    # Same users, counts and path lengths as detect_privilege_escalation, from a
+    # stream of per-user results over shared policy class distances. Callers that
+    # only need counts can run summarize_escalations(..., keep_paths=False) on it
+    global traversal_count
+    summary = summarize_escalations(iter_policy_class_escalations(G))
+    traversal_count = summary.num_results
+
+    return summary.escalation_paths, summary.path_complexity, traversal_count
+
+def generate_policy_graph(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                          backend='networkx', seed=None, attributes='shared'):
+    users, resources, permissions, policy_classes, G = generate_ngac_model(
+        num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, backend, rng=seed,
+        attributes=attributes)
+    G = build_ngac_policy_dag(G, users, resources, permissions, policy_classes)
+
+    model = {'users': users, 'resources': resources, 'permissions': permissions, 'policy_classes': policy_classes}
+    return model, G
+
+def run_configuration(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                      backend='networkx', detector='descendants', attributes='shared', seed=None, snapshot_dir=None,
+                      runs=1, trace_memory=False, profile=None):
+    sizes = (num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions)
+    timer = PhaseTimer(runs, trace_memory, profile_session(profile, sizes, seed))
+
+    if snapshot_dir is None:
+        users, resources, permissions, policy_classes, model_graph = timer.measure(
+            'Generate', generate_ngac_model, *sizes, backend, rng=seed, attributes=attributes)
+
+        # The build adds edges in place, so every run starts from a fresh copy
+        G = timer.measure('Build', build_ngac_policy_dag,
+                          setup=lambda: (model_graph.copy(), users, resources, permissions, policy_classes))
+    else:
+        # Generate here is the snapshot load (or the first generate and save)
+        snapshot_name = 'ngac_dag_policy_full_model' if attributes == 'shared' else f'ngac_dag_policy_full_model_{attributes}'
+        model, G = timer.measure('Generate', load_or_generate, snapshot_dir, snapshot_name, sizes, seed,
+                                 partial(generate_policy_graph, *sizes, backend, seed, attributes), backend)
+        users = model['users']
+
+    detect = {'descendants': detect_privilege_escalation, 'cached': detect_privilege_escalation_cached,
+              'sparse': detect_privilege_escalation_sparse, 'lazy': detect_privilege_escalation_lazy}[detector]
+    cache_columns = ['', '', '']
+    if detector == 'cached':
+        (detected_paths, path_complexity, traversal_frequency), cache_columns = measure_with_cache(
+            timer, 'Detect', detect, G, policy_class_cache)
+    else:
+        detected_paths, path_complexity, traversal_frequency = timer.measure('Detect', detect, G)
+
+    detection_accuracy = len(detected_paths) / max(1, len(users))
+    graph_size = G.number_of_nodes() + G.number_of_edges()
+    graph_memory = memory_footprint(G)
+
+    return [num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+            detection_accuracy, path_complexity, traversal_frequency, timer.seconds('Detect'), graph_size,
+            timer.seconds('Generate') + timer.seconds('Build'), graph_memory] + cache_columns + timer.columns() + [seed]
+
+def run_ngac_simulation(log_ranges, repetitions=10, backend='networkx', detector='descendants', attributes='shared', workers=1,
+                        seed=None, snapshot_dir=None, resume=False, compress=False, runs=1, trace_memory=False, profile=None):
+    csv_file = '/tmp/ngac_policy_dag_policy_full_model_results.csv'
+    header = ['Num_Users', 'Num_User_Attributes', 'Num_Resources', 'Num_Resource_Attributes', 'Num_Permissions',
+              'Detection_Accuracy', 'Path_Complexity', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size',
+              'Graph_Build_Time', 'Graph_Memory'] + CACHE_HEADER + TIMING_HEADER + ['Seed']
+    return write_sweep(csv_file, header, run_configuration, log_ranges, repetitions, workers=workers, seed=seed,
+                       resume=resume, compress=compress, backend=backend, detector=detector, attributes=attributes, snapshot_dir=snapshot_dir, runs=runs,
+                       trace_memory=trace_memory,
+                       profile=profile.for_results(csv_file) if profile is not None else None)
+
+def replay_model(csv_file, row_number, backend='networkx', attributes='shared'):
+    # Rebuild the exact model and graph behind one CSV row, e.g. to profile a slow case in isolation
+    sizes, seed = load_row_configuration(csv_file, row_number)
+    users, resources, permissions, policy_classes, G = generate_ngac_model(*sizes, backend, rng=seed, attributes=attributes)
+    G = build_ngac_policy_dag(G, users, resources, permissions, policy_classes)
 
-    return csv_file
+    return users, resources, permissions, policy_classes, G
 
 
 if __name__ == "__main__":
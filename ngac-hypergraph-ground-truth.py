@@ -1,11 +1,21 @@
-import random
-import time
-import csv
-import hypernetx as hnx
+from functools import partial
+from attributes import AttributeTable
+from footprint import memory_footprint
+from incidence import (Incidence, IncidenceBuilder, hypergraph_from_incidence, incidence_from_hypergraph, incidence_matrix,
+                       policy_class_hits, policy_class_paths)
+from profiling import profile_session
+from snapshot import load_or_generate
+from sweep import load_row_configuration, make_rng, write_sweep
+from timing import TIMING_HEADER, PhaseTimer
 
 traversal_count = 0
 
-def generate_ngac_model(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions):
+POLICY_CLASS_NODES = frozenset(['IAM', 'EC2', 'S3', 'KMS', 'RDS'])
+
+
+def generate_ngac_incidence(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, rng=None,
+                            attributes='per_entity'):
+    rng = make_rng(rng)
     ground_truth_paths = {}  # Dictionary to store true paths for FP/FN calculation
     
     all_permissions = [
@@ -14,68 +24,67 @@ def generate_ngac_model(num_users, num_user_attributes, num_resources, num_resou
     ]
 
     users = {f"User_{i}": {
-        'UserType': random.choice(['Admin', 'User', 'Service']),
-        'AuthType': random.choice(['Password', 'MFA', 'Federated'])
+        'UserType': rng.choice(['Admin', 'User', 'Service']),
+        'AuthType': rng.choice(['Password', 'MFA', 'Federated'])
     } for i in range(num_users)}
 
     resources = {f"Resource_{i}": {
-        'LeastPrivilegePolicy': random.choice(['Strict', 'Relaxed']),
-        'ResourceType': random.choice(['EC2', 'S3', 'KMS', 'RDS']),
-        'IsCreateModify': random.choice(['True', 'False'])
+        'LeastPrivilegePolicy': rng.choice(['Strict', 'Relaxed']),
+        'ResourceType': rng.choice(['EC2', 'S3', 'KMS', 'RDS']),
+        'IsCreateModify': rng.choice(['True', 'False'])
     } for i in range(num_resources)}
 
-    permissions = random.choices(all_permissions, k=num_permissions)
+    permissions = rng.choices(all_permissions, k=num_permissions)
 
     policy_classes = ['IAM', 'EC2', 'S3', 'KMS', 'RDS']
 
-    # Dictionary to hold all edges
-    edges = {}
+    # Hyperedges as parallel (edge_id, node_id) arrays
+    incidence = IncidenceBuilder()
+    attribute_table = AttributeTable(attributes)
     edge_count = 0
-
-    # Register all nodes in a dictionary to be added explicitly
-    nodes = set()
+    resource_names = list(resources)
 
     # Add user nodes and associate them with realistic permission-resource edges
     for user, data in users.items():
-        nodes.add(user)
-        selected_permission = random.choice(permissions)
-        selected_resource = random.choice(list(resources.keys()))
+        selected_permission = rng.choice(permissions)
+        selected_resource = rng.choice(resource_names)
 
         # Link users directly to permissions and resources (Bidirectional edge addition)
-        edges[f"Edge_User_{edge_count}"] = {user, selected_permission, selected_resource}
+        incidence.add_edge(f"Edge_User_{edge_count}", (user, selected_permission, selected_resource))
         edge_count += 1
 
         for key, value in data.items():
-            attribute_node = f'{user}_{key}:{value}'
-            nodes.add(attribute_node)
-            edges[f"Edge_{edge_count}"] = {user, attribute_node}
+            attribute_node = attribute_table.node(user, key, value)
+            incidence.add_edge(f"Edge_{edge_count}", (user, attribute_node))
             edge_count += 1
 
     # Add resource nodes
     for resource, data in resources.items():
-        nodes.add(resource)
         for key, value in data.items():
-            attribute_node = f'{resource}_{key}:{value}'
-            nodes.add(attribute_node)
-            edges[f"Edge_{edge_count}"] = {attribute_node, resource}
+            attribute_node = attribute_table.node(resource, key, value)
+            incidence.add_edge(f"Edge_{edge_count}", (attribute_node, resource))
             edge_count += 1
 
-    # Add permission nodes
+    # Add permission nodes, with one bulk insert of the permission x resource edges
     for permission in permissions:
-        nodes.add(permission)
-        for resource in resources:
-            edges[f"Edge_{edge_count}"] = {permission, resource}
-            edge_count += 1
+        incidence.add_edges([f"Edge_{edge_count + i}" for i in range(len(resource_names))], permission, resource_names)
+        edge_count += len(resource_names)
+        # Link the last resource to the policy classes
         for policy_class in policy_classes:
-            edges[f"Edge_{edge_count}"] = {resource, policy_class}
+            incidence.add_edge(f"Edge_{edge_count}", (resource_names[-1], policy_class))
             edge_count += 1
 
-    # Add policy classes as nodes
-    for policy_class in policy_classes:
-        nodes.add(policy_class)
+    return users, resources, permissions, policy_classes, incidence.to_incidence(), ground_truth_paths
 
-    # Initialize Hypergraph with edges
-    H = hnx.Hypergraph(edges)
+def build_ngac_hypergraph(incidence):
+    # Initialize Hypergraph from the incidence pairs in one shot
+    return hypergraph_from_incidence(incidence)
+
+def generate_ngac_model(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, rng=None,
+                        attributes='per_entity'):
+    users, resources, permissions, policy_classes, incidence, ground_truth_paths = generate_ngac_incidence(
+        num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, rng, attributes)
+    H = build_ngac_hypergraph(incidence)
 
     return users, resources, permissions, policy_classes, H, ground_truth_paths
 
@@ -129,11 +138,114 @@ def detect_privilege_escalation(H, ground_truth_paths):
         if user not in ground_truth_paths:
             false_positives += 1
     return escalation_paths, path_complexity, traversal_count, false_positives, false_negatives
-    
 
-def run_ngac_hypergraph_simulation(repetitions=1):
-    results = []
+def detect_privilege_escalation_sparse(incidence, ground_truth_paths, matrix=None):
+    # Same results as detect_privilege_escalation, from the sparse incidence matrix:
+    # user and resource rows intersected with the columns of policy class edges
+    global traversal_count
+    if matrix is None:
+        matrix = incidence_matrix(incidence)
+
+    escalation_paths = {}
+    traversal_count = 0
+    for name_pattern in ('User_', 'Resource_'):
+        paths, hit_counts = policy_class_hits(incidence, name_pattern, POLICY_CLASS_NODES, matrix)
+        escalation_paths.update(paths)
+        traversal_count += sum(hit_counts.values())
+
+    # Every hit is a single-edge path
+    path_complexity = 1.0 if traversal_count else 0
+
+    false_negatives = len([user for user in ground_truth_paths if user not in escalation_paths])
+    false_positives = len([user for user in escalation_paths if user not in ground_truth_paths])
+    return escalation_paths, path_complexity, traversal_count, false_positives, false_negatives
+
+def detect_privilege_escalation_multi_hop(H, ground_truth_paths, sources, layers, max_depth=4):
+    # Shortest escalation paths of up to max_depth hyperedges from every source to a
+    # policy class through the layers in order ([users, permissions, resources]),
+    # e.g. user -> permission/resource edge -> resource -> policy class edge, found
+    # for all sources in one frontier search
+    global traversal_count
+    incidence = H if isinstance(H, Incidence) else incidence_from_hypergraph(H)
+
+    escalation_paths, traversal_count = policy_class_paths(incidence, sources, POLICY_CLASS_NODES, max_depth, layers)
 
+    # Paths alternate nodes and hyperedges
+    path_lengths = [len(path) // 2 for path in escalation_paths.values()]
+    if len(path_lengths) > 0:
+        path_complexity = sum(path_lengths) / len(path_lengths)
+    else:
+        path_complexity = 0
+
+    # There is one shortest path per flagged source, so counting false positives per
+    # hit, as the single-edge detectors do, counts each flagged source outside the
+    # ground truth once
+    false_positives = len([user for user in escalation_paths if user not in ground_truth_paths])
+    false_negatives = len([user for user in ground_truth_paths if user not in escalation_paths])
+    return escalation_paths, path_complexity, traversal_count, false_positives, false_negatives
+
+def generate_policy_hypergraph(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                               backend='hypernetx', seed=None, attributes='per_entity'):
+    users, resources, permissions, policy_classes, H, ground_truth_paths = generate_ngac_incidence(
+        num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, rng=seed,
+        attributes=attributes)
+    if backend == 'hypernetx':
+        H = build_ngac_hypergraph(H)
+
+    model = {'users': users, 'resources': resources, 'permissions': permissions, 'policy_classes': policy_classes,
+             'ground_truth_paths': ground_truth_paths}
+    return model, H
+
+def run_configuration(num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions,
+                      backend='hypernetx', max_depth=None, attributes='per_entity', seed=None, snapshot_dir=None, runs=1,
+                      trace_memory=False, profile=None):
+    sizes = (num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions)
+    timer = PhaseTimer(runs, trace_memory, profile_session(profile, sizes, seed))
+    detect_options = {}
+
+    if snapshot_dir is None:
+        users, resources, permissions, policy_classes, H, ground_truth_paths = timer.measure(
+            'Generate', generate_ngac_incidence, num_users, num_user_attributes, num_resources, num_resource_attributes,
+            num_permissions, rng=seed, attributes=attributes)
+        if backend == 'hypernetx':
+            H = timer.measure('Build', build_ngac_hypergraph, H)
+        else:
+            detect_options['matrix'] = timer.measure('Build', incidence_matrix, H)
+    else:
+        # Generate here is the snapshot load (or the first generate and save)
+        snapshot_name = 'ngac_hypergraph_ground_truth' if attributes == 'per_entity' else f'ngac_hypergraph_ground_truth_{attributes}'
+        model, H = timer.measure('Generate', load_or_generate, snapshot_dir, snapshot_name, sizes, seed,
+                                 partial(generate_policy_hypergraph, *sizes, backend, seed, attributes), backend)
+        users = model['users']
+        resources = model['resources']
+        permissions = model['permissions']
+        ground_truth_paths = model['ground_truth_paths']
+    build_time = timer.seconds('Generate') + timer.seconds('Build')
+
+    # Footprint of the hypergraph (and the incidence matrix the sparse detector is given)
+    graph_memory = memory_footprint(H, *detect_options.values())
+
+    detect = detect_privilege_escalation if backend == 'hypernetx' else detect_privilege_escalation_sparse
+    if max_depth is not None:
+        detect = partial(detect_privilege_escalation_multi_hop, sources=list(users),
+                         layers=[list(users), permissions, list(resources)], max_depth=max_depth)
+        detect_options = {}
+    detected_paths, path_complexity, traversal_frequency, false_positives, false_negatives = timer.measure(
+        'Detect', detect, H, ground_truth_paths, **detect_options)
+
+    detection_accuracy = len(detected_paths) / max(1, len(users))
+
+    # Using built-in routines to get nodes and edges count
+    num_nodes = len(H.nodes) if backend == 'hypernetx' else len(H.node_names)
+    num_edges = len(H.edges) if backend == 'hypernetx' else len(H.edge_names)
+    graph_size = num_nodes + num_edges  # Properly count nodes and edges
+
+    return [num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, false_positives, false_negatives,
+            detection_accuracy, path_complexity, traversal_frequency, timer.seconds('Detect'), graph_size,
+            build_time, graph_memory] + timer.columns() + [seed]
+
+def run_ngac_hypergraph_simulation(repetitions=1, backend='hypernetx', max_depth=None, attributes='per_entity', workers=1,
+                                   seed=None, snapshot_dir=None, resume=False, compress=False, runs=1, trace_memory=False, profile=None):
     log_ranges = [
         (100, 20, 30, 30, 10),
         (200, 40, 60, 60, 15),
@@ -144,37 +256,18 @@ def run_ngac_hypergraph_simulation(repetitions=1):
         (2000, 400, 420, 420, 70),
     ]
 
-    for _ in range(repetitions):
-        for num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions in log_ranges:
-
-            start_time = time.time()
-            users, resources, permissions, policy_classes, H, ground_truth_paths = generate_ngac_model(
-                num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions)
-            build_time = time.time() - start_time
-
-            start_time = time.time()
-            detected_paths, path_complexity, traversal_frequency, false_positives, false_negatives = detect_privilege_escalation(H, ground_truth_paths)
-            detection_time = time.time() - start_time
-
-            detection_accuracy = len(detected_paths) / max(1, len(users))
-
-            # Using built-in routines to get nodes and edges count
-            num_nodes = len(H.nodes)
-            num_edges = len(H.edges)
-            graph_size = num_nodes + num_edges  # Properly count nodes and edges
-
-            results.append([num_users, num_user_attributes, num_resources, num_resource_attributes, num_permissions, false_positives, false_negatives,
-                            detection_accuracy, path_complexity, traversal_frequency, detection_time, graph_size, build_time])
-
-    csv_file = '/tmp/ngac_hypergraph_simulation_fixed_results.csv'
-    with open(csv_file, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['Num_Users', 'Num_User_Attributes', 'Num_Resources', 'Num_Resource_Attributes', 'Num_Permissions', "FP", "FN",
-                         'Detection_Accuracy', 'Path_Complexity', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size', 'Graph_Build_Time'])
-        for row in results:
-            writer.writerow(row)
-
-    return csv_file
+    csv_file = '/tmp/ngac_hypergraph_simulation_ground_truth_results.csv'
+    header = ['Num_Users', 'Num_User_Attributes', 'Num_Resources', 'Num_Resource_Attributes', 'Num_Permissions', "FP", "FN",
+              'Detection_Accuracy', 'Path_Complexity', 'Traversal_Frequency', 'Detection_Time', 'Graph_Size', 'Graph_Build_Time', 'Graph_Memory'] + TIMING_HEADER + ['Seed']
+    return write_sweep(csv_file, header, run_configuration, log_ranges, repetitions, workers=workers, seed=seed,
+                       resume=resume, compress=compress, backend=backend, max_depth=max_depth, attributes=attributes,
+                       snapshot_dir=snapshot_dir, runs=runs, trace_memory=trace_memory,
+                       profile=profile.for_results(csv_file) if profile is not None else None)
+
+def replay_model(csv_file, row_number, attributes='per_entity'):
+    # Rebuild the exact model and hypergraph behind one CSV row, e.g. to profile a slow case in isolation
+    sizes, seed = load_row_configuration(csv_file, row_number)
+    return generate_ngac_model(*sizes, rng=seed, attributes=attributes)
 
 
 if __name__ == "__main__":
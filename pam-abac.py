@@ -1,19 +1,29 @@
-import random
 import time
 import csv
+from functools import partial
 import networkx as nx
+from escalation import ESCALATION_PATTERNS, PatternAutomaton, batched_role_chain_escalation, role_chain_cache
+from evaluation_cache import CACHE_HEADER, measure_with_cache
+from incremental import IncrementalABACDetector
+from profiling import profile_session
+from snapshot import load_or_generate
+from sweep import load_row_configuration, make_rng, write_sweep
+from timing import TIMING_HEADER, PhaseTimer
 
 traversal_count = 0
 
-def generate_abac_model(num_users, num_roles, num_resources):
-    all_permissions = [
-        'iam:PassRole', 'ec2:RunInstances', 's3:PutObject',
-        'iam:AttachRolePolicy', 'iam:UpdateRole', 'iam:UpdateAssumeRolePolicy'
-    ]
+ALL_PERMISSIONS = [
+    'iam:PassRole', 'ec2:RunInstances', 's3:PutObject',
+    'iam:AttachRolePolicy', 'iam:UpdateRole', 'iam:UpdateAssumeRolePolicy'
+]
+
+
+def generate_abac_model(num_users, num_roles, num_resources, rng=None):
+    rng = make_rng(rng)
 
-    users = {f"User_{i}": {'JobTitle': random.choice(['Developer', 'DataEngineer', 'SecurityAdmin'])} for i in range(num_users)}
-    roles = {f"Role_{i}": {'Permissions': random.choices(all_permissions, k=random.randint(1, len(all_permissions)))} for i in range(num_roles)}
-    resources = {f"Resource_{i}": random.choice(['EC2Instance', 'S3Bucket', 'IAMRole']) for i in range(num_resources)}
+    users = {f"User_{i}": {'JobTitle': rng.choice(['Developer', 'DataEngineer', 'SecurityAdmin'])} for i in range(num_users)}
+    roles = {f"Role_{i}": {'Permissions': rng.choices(ALL_PERMISSIONS, k=rng.randint(1, len(ALL_PERMISSIONS)))} for i in range(num_roles)}
+    resources = {f"Resource_{i}": rng.choice(['EC2Instance', 'S3Bucket', 'IAMRole']) for i in range(num_resources)}
     policies = {}
     ground_truth_paths = {}
 
@@ -29,13 +39,13 @@ def generate_abac_model(num_users, num_roles, num_resources):
 
     # Generate user-role associations
     for user, attributes in users.items():
-        policies[user] = random.sample(list(roles.keys()), random.randint(1, 3))
+        policies[user] = rng.sample(list(roles.keys()), rng.randint(1, 3))
         for role in policies[user]:
             G.add_edge(user, role)
 
     # Inject known valid paths (Ground Truth)
     for i in range(max(1, num_users // 20)):  # Create at least one ground truth path
-        user = random.choice(list(users.keys()))
+        user = rng.choice(list(users.keys()))
         role_A = f"Role_GT_A_{i}"
         role_B = f"Role_GT_B_{i}"
         resource = f"Resource_GT_{i}"
@@ -75,41 +85,146 @@ def detect_privilege_escalation(G):
 
     return escalation_paths
 
-def run_privilege_escalation_simulation(log_ranges, repetitions=10):
-    results = []
+def detect_privilege_escalation_batched(G):
+    # Same paths as detect_privilege_escalation, with each role's PassRole -> IAMRole ->
+    # RunInstances chain evaluated once instead of once per user that holds it
+    escalation_paths, _ = batched_role_chain_escalation(G)
+    return escalation_paths
 
-    for _ in range(repetitions):
-        for num_users, num_roles, num_resources in log_ranges:
-            global traversal_count
-            traversal_count = 0
+def detect_privilege_escalation_cached(G, cache=None):
+    # detect_privilege_escalation_batched with each role's chain evaluated the first
+    # time a user reaches it and served from the cache after that
+    if cache is None:
+        cache = role_chain_cache(G)
 
-            users, roles, resources, policies, ground_truth_paths, G = generate_abac_model(num_users, num_roles, num_resources)
+    escalation_paths, _ = batched_role_chain_escalation(G, cache)
+    return escalation_paths
 
-            start_time = time.time()
-            detected_paths = detect_privilege_escalation(G)
-            detection_time = time.time() - start_time
+def detect_escalation_patterns(G, automaton=None):
+    # Every pattern of the escalation catalogue in one traversal, mapping each flagged
+    # user to {pattern: path} for the patterns it matches
+    global traversal_count
+    if automaton is None:
+        automaton = PatternAutomaton(ESCALATION_PATTERNS)
 
-            # Compare detected paths with ground truth
-            true_positives = len([user for user in detected_paths if user in ground_truth_paths])
-            false_positives = len([user for user in detected_paths if user not in ground_truth_paths])
-            false_negatives = len([user for user in ground_truth_paths if user not in detected_paths])
+    matches, traversal_count = automaton.match(G)
+    escalation_paths = {}
+    for name, paths in matches.items():
+        for user, path in paths.items():
+            escalation_paths.setdefault(user, {})[name] = path
 
-            fpr = false_positives / max(1, false_positives + true_positives)
-            fnr = false_negatives / max(1, len(ground_truth_paths))
+    return escalation_paths
 
-            graph_size = G.number_of_nodes() + G.number_of_edges()
+def generate_policy_graph(num_users, num_roles, num_resources, seed=None):
+    users, roles, resources, policies, ground_truth_paths, G = generate_abac_model(num_users, num_roles, num_resources, rng=seed)
 
-            results.append([num_users, num_roles, num_resources, fpr, fnr, detection_time, graph_size])
+    model = {'users': users, 'roles': roles, 'resources': resources, 'policies': policies,
+             'ground_truth_paths': ground_truth_paths}
+    return model, G
 
+def run_configuration(num_users, num_roles, num_resources, detector='nested', seed=None, snapshot_dir=None, runs=1,
+                      trace_memory=False, profile=None):
+    global traversal_count
+    traversal_count = 0
+    # The model is built as it is generated, so there is no separate Build phase
+    timer = PhaseTimer(runs, trace_memory, profile_session(profile, (num_users, num_roles, num_resources), seed))
+
+    if snapshot_dir is None:
+        users, roles, resources, policies, ground_truth_paths, G = timer.measure(
+            'Generate', generate_abac_model, num_users, num_roles, num_resources, rng=seed)
+    else:
+        sizes = (num_users, num_roles, num_resources)
+        model, G = timer.measure('Generate', load_or_generate, snapshot_dir, 'pam_abac', sizes, seed,
+                                 partial(generate_policy_graph, *sizes, seed), 'networkx')
+        ground_truth_paths = model['ground_truth_paths']
+
+    detect = {'nested': detect_privilege_escalation, 'batched': detect_privilege_escalation_batched,
+              'cached': detect_privilege_escalation_cached, 'patterns': detect_escalation_patterns}[detector]
+    cache_columns = ['', '', '']
+    if detector == 'cached':
+        detected_paths, cache_columns = measure_with_cache(timer, 'Detect', detect, G, role_chain_cache)
+    else:
+        detected_paths = timer.measure('Detect', detect, G)
+
+    # Compare detected paths with ground truth
+    true_positives = len([user for user in detected_paths if user in ground_truth_paths])
+    false_positives = len([user for user in detected_paths if user not in ground_truth_paths])
+    false_negatives = len([user for user in ground_truth_paths if user not in detected_paths])
+
+    fpr = false_positives / max(1, false_positives + true_positives)
+    fnr = false_negatives / max(1, len(ground_truth_paths))
+
+    graph_size = G.number_of_nodes() + G.number_of_edges()
+
+    return [num_users, num_roles, num_resources, fpr, fnr, timer.seconds('Detect'), graph_size] + cache_columns + timer.columns() + [seed]
+
+def run_privilege_escalation_simulation(log_ranges, repetitions=10, detector='nested', workers=1, seed=None,
+                                        snapshot_dir=None, resume=False, compress=False, runs=1, trace_memory=False, profile=None):
     csv_file = '/tmp/abac_privilege_escalation_fpr_fnr_fixed_v2_results.csv'
+    header = ['Num_Users', 'Num_Roles', 'Num_Resources', 'FPR', 'FNR', 'Detection_Time', 'Graph_Size'] + CACHE_HEADER + TIMING_HEADER + ['Seed']
+    return write_sweep(csv_file, header, run_configuration, log_ranges, repetitions, workers=workers, seed=seed,
+                       resume=resume, compress=compress, detector=detector, snapshot_dir=snapshot_dir, runs=runs,
+                       trace_memory=trace_memory,
+                       profile=profile.for_results(csv_file) if profile is not None else None)
+
+def apply_random_update(detector, users, roles, resources, rng):
+    # Toggle one random user-role, role-resource or resource-role assignment, or
+    # redraw one role's permissions
+    G = detector.G
+    kind = rng.choice(['user_role', 'role_resource', 'resource_role', 'permissions'])
+
+    if kind == 'permissions':
+        role = rng.choice(roles)
+        return detector.set_role_permissions(role, rng.choices(ALL_PERMISSIONS, k=rng.randint(1, len(ALL_PERMISSIONS))))
+
+    if kind == 'user_role':
+        u, v = rng.choice(users), rng.choice(roles)
+    elif kind == 'role_resource':
+        u, v = rng.choice(roles), rng.choice(resources)
+    else:
+        u, v = rng.choice(resources), rng.choice(roles)
+
+    if G.has_edge(u, v):
+        return detector.remove_assignment(u, v)
+    return detector.add_assignment(u, v)
+
+def run_update_benchmark(log_ranges, num_updates=100, seed=None):
+    rng = make_rng(seed)
+    results = []
+
+    for num_users, num_roles, num_resources in log_ranges:
+        model_seed = rng.getrandbits(32)
+        users, roles, resources, policies, ground_truth_paths, G = generate_abac_model(num_users, num_roles, num_resources, rng=model_seed)
+        detector = IncrementalABACDetector(G)
+
+        start_time = time.perf_counter()
+        detect_privilege_escalation(G)
+        full_recompute_time = time.perf_counter() - start_time
+
+        update_times = []
+        for _ in range(num_updates):
+            start_time = time.perf_counter()
+            apply_random_update(detector, list(users), list(roles), list(resources), rng)
+            update_times.append(time.perf_counter() - start_time)
+
+        results.append([num_users, num_roles, num_resources, num_updates, sum(update_times) / len(update_times),
+                        max(update_times), full_recompute_time, model_seed])
+
+    csv_file = '/tmp/abac_incremental_update_results.csv'
     with open(csv_file, mode='w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(['Num_Users', 'Num_Roles', 'Num_Resources', 'FPR', 'FNR', 'Detection_Time', 'Graph_Size'])
+        writer.writerow(['Num_Users', 'Num_Roles', 'Num_Resources', 'Num_Updates', 'Update_Latency', 'Max_Update_Latency',
+                         'Full_Recompute_Latency', 'Seed'])
         for row in results:
             writer.writerow(row)
 
     return csv_file
 
+def replay_model(csv_file, row_number):
+    # Rebuild the exact model and graph behind one CSV row, e.g. to profile a slow case in isolation
+    (num_users, num_roles, num_resources), seed = load_row_configuration(csv_file, row_number)
+    return generate_abac_model(num_users, num_roles, num_resources, rng=seed)
+
 
 if __name__ == "__main__":
     log_ranges = [
@@ -0,0 +1,237 @@
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import tempfile
+import time
+from functools import partial
+
+from benchmark import load_script
+from escalation import escalation_capable_roles
+from reachability import compute_policy_class_reachability
+from timing import percentile
+
+# Size columns and generator script of each model the server can load
+MODEL_SCRIPTS = {'ngac': 'ngac-dag-policy-full-model.py', 'abac': 'abac-dag.py'}
+SIZE_HEADERS = {
+    'ngac': ['Num_Users', 'Num_User_Attributes', 'Num_Resources', 'Num_Resource_Attributes', 'Num_Permissions'],
+    'abac': ['Num_Users', 'Num_Roles', 'Num_Resources'],
+}
+
+
+class DecisionTable:
+    # Every user's answers for one policy graph, computed once when the server
+    # loads it so that each query is a dictionary lookup. first_hops maps each
+    # successor a user escalates through (an escalation-capable role in the ABAC
+    # models, a permission or attribute node that reaches a policy class in the
+    # NGAC DAG) to its witness; escalation holds the witness the batch detector
+    # reports for the user
+    def __init__(self, G, model='ngac'):
+        self.model = model
+        self.first_hops = {}
+        self.escalation = {}
+        self.policy_classes = {}
+        users = [n for n, d in G.nodes(data=True) if d['type'] == 'User']
+
+        if model == 'abac':
+            roles = escalation_capable_roles(G)
+            for user in users:
+                hops = {role: roles[role][0] for role in G.successors(user)
+                        if G.nodes[role]['type'] == 'Role' and roles[role][0] is not None}
+                self.first_hops[user] = hops
+                if hops:
+                    # The last capable role wins, as in detect_privilege_escalation
+                    self.escalation[user] = list(hops.values())[-1]
+        else:
+            # NGAC witnesses are {policy class: distance} tables
+            reachability = compute_policy_class_reachability(G)
+            for user in users:
+                self.policy_classes[user] = reachability[user]
+                if reachability[user]:
+                    self.escalation[user] = reachability[user]
+                self.first_hops[user] = {
+                    successor: {policy_class: distance + 1 for policy_class, distance in reachability[successor].items()}
+                    for successor in G.successors(user) if reachability[successor]}
+
+    def answer(self, query):
+        # {'op': 'escalation', 'user': U[, 'via': X]} asks whether U can escalate
+        # (through its successor X); {'op': 'reach', 'user': U, 'target': PC} asks
+        # for U's distance to a policy class in the NGAC DAG
+        if not isinstance(query, dict):
+            return {'error': 'query must be an object'}
+        user = query.get('user')
+        if user not in self.first_hops:
+            return {'error': f"unknown user {user!r}"}
+
+        op = query.get('op', 'escalation')
+        if op == 'escalation':
+            if 'via' in query:
+                witness = self.first_hops[user].get(query['via'])
+            else:
+                witness = self.escalation.get(user)
+            return {'user': user, 'escalates': witness is not None, 'witness': witness}
+        if op == 'reach' and self.model == 'ngac':
+            distance = self.policy_classes[user].get(query.get('target'))
+            return {'user': user, 'reachable': distance is not None, 'distance': distance}
+        return {'error': f"unsupported op {op!r} for the {self.model} model"}
+
+
+def _answer(table, query):
+    # A list or object where a name belongs cannot be looked up; it gets an error
+    # answer like any other malformed query instead of closing the connection
+    try:
+        return table.answer(query)
+    except TypeError as error:
+        return {'error': f"malformed query: {error}"}
+
+async def _handle_connection(table, reader, writer):
+    # Newline-delimited JSON: each line holds one query object, answered by one
+    # line, or a list of queries (a batch), answered by one line with the list of
+    # answers. Clients may pipeline lines without waiting for the answers
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as error:
+                response = {'error': str(error)}
+            else:
+                if isinstance(request, list):
+                    response = [_answer(table, query) for query in request]
+                else:
+                    response = _answer(table, request)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+    except ConnectionResetError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(table, path=None, host='127.0.0.1', port=8470, ready=None):
+    # Answers queries against table until cancelled, on a Unix socket at path or
+    # on host:port otherwise; ready(server) is called once it is listening
+    handler = partial(_handle_connection, table)
+    if path is not None:
+        server = await asyncio.start_unix_server(handler, path=path)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+def run_server(G, model='ngac', path=None, host='127.0.0.1', port=8470):
+    # Long-running decision point: the graph is loaded and every user's answers
+    # precomputed once, then queries are served until the process is stopped
+    asyncio.run(serve(DecisionTable(G, model), path, host, port))
+
+def _serve_generated(model, sizes, seed, path, loaded):
+    # Child process of the load benchmark: builds the model graph, precomputes the
+    # table and reports the load time once the socket is listening
+    start = time.perf_counter_ns()
+    _, G = load_script(MODEL_SCRIPTS[model]).generate_policy_graph(*sizes, seed=seed)
+    table = DecisionTable(G, model)
+    load_time = (time.perf_counter_ns() - start) / 1e9
+    asyncio.run(serve(table, path, ready=lambda server: loaded.put(load_time)))
+
+def _wait_for_load(server, loaded, poll_interval=1.0):
+    # The load time the server process reports once it is listening, or an error
+    # as soon as the process dies without reporting one
+    while True:
+        try:
+            return loaded.get(timeout=poll_interval)
+        except queue.Empty:
+            if not server.is_alive():
+                raise RuntimeError(f"policy server exited with code {server.exitcode} before it was loaded")
+
+def generate_queries(model, sizes, num_queries, rng=None):
+    # Random mix of plain, 'via' and (for NGAC) 'reach' queries over the users of
+    # a generated model
+    rng = random.Random(rng)
+    queries = []
+    for _ in range(num_queries):
+        query = {'op': 'escalation', 'user': f"User_{rng.randrange(sizes[0])}"}
+        kind = rng.random()
+        if model == 'ngac' and kind < 0.3:
+            query = {'op': 'reach', 'user': query['user'], 'target': rng.choice(['IAM', 'EC2', 'S3', 'KMS', 'RDS'])}
+        elif kind < 0.6:
+            if model == 'ngac':
+                query['via'] = rng.choice(['iam:PassRole', 'ec2:RunInstances', 's3:PutObject'])
+            else:
+                query['via'] = f"Role_{rng.randrange(sizes[1])}"
+        queries.append(query)
+    return queries
+
+async def _client(path, queries, batch_size, latencies):
+    # Sends queries in batches of batch_size, one batch in flight at a time; every
+    # query in a batch is charged the batch's round trip
+    reader, writer = await asyncio.open_unix_connection(path)
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        payload = json.dumps(batch if batch_size > 1 else batch[0]).encode() + b'\n'
+        begin = time.perf_counter_ns()
+        writer.write(payload)
+        await writer.drain()
+        await reader.readline()
+        latencies.extend([time.perf_counter_ns() - begin] * len(batch))
+    writer.close()
+    await writer.wait_closed()
+
+async def generate_load(path, queries, connections, batch_size):
+    # (queries per second, median and p99 latency in seconds) of the queries split
+    # over concurrent connections
+    latencies = []
+    share = -(-len(queries) // connections)
+    start = time.perf_counter_ns()
+    await asyncio.gather(*[_client(path, queries[i:i + share], batch_size, latencies)
+                           for i in range(0, len(queries), share)])
+    elapsed = (time.perf_counter_ns() - start) / 1e9
+    return len(queries) / elapsed, percentile(latencies, 0.5) / 1e9, percentile(latencies, 0.99) / 1e9
+
+def run_load_benchmark(log_ranges, model='ngac', connections=8, batch_sizes=(1, 16, 128), num_queries=20000, seed=None):
+    # Starts a server process per size tuple and drives it with every batch size.
+    # The server has a process of its own, so load generation does not compete
+    # with it for the event loop
+    csv_file = f'/tmp/policy_server_{model}_load_results.csv'
+    header = SIZE_HEADERS[model] + ['Connections', 'Batch_Size', 'Queries', 'QPS', 'Latency_P50', 'Latency_P99',
+                                    'Load_Time', 'Seed']
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(32)
+
+    with open(csv_file, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+
+        for sizes in log_ranges:
+            socket_dir = tempfile.mkdtemp()
+            path = os.path.join(socket_dir, 'policy_server.sock')
+            loaded = multiprocessing.Queue()
+            server = multiprocessing.Process(target=_serve_generated, args=(model, tuple(sizes), seed, path, loaded),
+                                             daemon=True)
+            server.start()
+            try:
+                load_time = _wait_for_load(server, loaded)
+                queries = generate_queries(model, sizes, num_queries, seed)
+                for batch_size in batch_sizes:
+                    qps, p50, p99 = asyncio.run(generate_load(path, queries, connections, batch_size))
+                    writer.writerow(list(sizes) + [connections, batch_size, num_queries, qps, p50, p99, load_time, seed])
+                    file.flush()
+            finally:
+                server.terminate()
+                server.join()
+                shutil.rmtree(socket_dir, ignore_errors=True)
+
+    return csv_file
+
+
+if __name__ == "__main__":
+    log_ranges = [
+        (1000, 2, 500, 3, 6), (10000, 20, 5000, 30, 6), (100000, 200, 50000, 300, 6)
+    ]
+    run_load_benchmark(log_ranges, model='ngac')
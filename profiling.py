@@ -0,0 +1,124 @@
+import cProfile
+import csv
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+PROFILE_HEADER = ['Phase', 'Rank', 'Function', 'Calls', 'Total_Time', 'Cumulative_Time']
+
+
+class Profiling:
+    # Opt-in profiling settings for a runner: the size tuples to profile (None
+    # profiles every configuration), how many hot functions each phase's summary
+    # lists, and the interval in seconds of the sampling stack dumps (None for no
+    # sampling). Artifacts go to directory, by default next to the runner's CSV
+    def __init__(self, sizes=None, top=25, sample_interval=None, directory=None):
+        self.sizes = None if sizes is None else {tuple(size) for size in sizes}
+        self.top = top
+        self.sample_interval = sample_interval
+        self.directory = directory
+
+    def for_results(self, csv_file):
+        if self.directory is not None:
+            return self
+        return Profiling(self.sizes, self.top, self.sample_interval, os.path.splitext(csv_file)[0] + '_profiles')
+
+    def session(self, sizes, seed, label=None):
+        if self.sizes is not None and tuple(sizes) not in self.sizes:
+            return None
+        return ProfileSession(self, sizes, seed, label)
+
+def profile_session(profile, sizes, seed, label=None):
+    # The PhaseTimer profiler of one configuration, or None when it is not profiled
+    return profile.session(sizes, seed, label) if profile is not None else None
+
+def _sampled_call(fn, args, kwargs):
+    # Marks the root of the sampled stacks, so frames of the runner above it are dropped
+    return fn(*args, **kwargs)
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    # Profiles the phases of one configuration. Each phase gets one extra run under
+    # cProfile, saved as <sizes>_<seed>_<phase>.prof for pstats or snakeviz, and
+    # with sampling one more run whose stacks are written in collapsed-stack format
+    # (<phase>.folded, one 'root;...;leaf count' line per stack) for flamegraph.pl
+    # or speedscope. <sizes>_<seed>_hot_functions.csv lists each phase's top
+    # functions by own time. Samples are taken by a background thread, so they
+    # are at best as frequent as the interpreter's switch interval
+    def __init__(self, settings, sizes, seed, label=None):
+        self.settings = settings
+        name = '_'.join(str(size) for size in sizes) + f'_{seed}'
+        if label is not None:
+            name = f'{label}_{name}'
+        self.prefix = os.path.join(settings.directory, name)
+        self.hot_functions = {}
+
+    def profile(self, phase, fn, args, kwargs):
+        os.makedirs(self.settings.directory, exist_ok=True)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+        profiler.dump_stats(f'{self.prefix}_{phase}.prof')
+        self.hot_functions[phase] = self._top_functions(pstats.Stats(profiler))
+        self._write_summary()
+
+    def sample(self, phase, fn, args, kwargs):
+        target = threading.get_ident()
+        stacks = Counter()
+        done = threading.Event()
+
+        def sampler():
+            while not done.wait(self.settings.sample_interval):
+                frame = sys._current_frames().get(target)
+                stack = []
+                while frame is not None and frame.f_code is not _sampled_call.__code__:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if frame is not None and stack:
+                    stacks[';'.join(reversed(stack))] += 1
+
+        thread = threading.Thread(target=sampler, daemon=True)
+        thread.start()
+        try:
+            _sampled_call(fn, args, kwargs)
+        finally:
+            done.set()
+            thread.join()
+
+        with open(f'{self.prefix}_{phase}.folded', 'w') as file:
+            for stack, count in stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+    def _top_functions(self, stats):
+        # (function, calls, own time, cumulative time), highest own time first
+        rows = []
+        for (file_name, line, function), (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+            label = function if file_name == '~' else f'{function} ({os.path.basename(file_name)}:{line})'
+            rows.append((label, calls, total_time, cumulative_time))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:self.settings.top]
+
+    def _write_summary(self):
+        # Rewritten after every phase, so the table is complete whenever a run stops
+        with open(f'{self.prefix}_hot_functions.csv', 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(PROFILE_HEADER)
+            for phase, rows in self.hot_functions.items():
+                for rank, row in enumerate(rows, start=1):
+                    writer.writerow([phase, rank] + list(row))
+
+    def run(self, phase, fn, call_args, kwargs):
+        # call_args() gives fresh arguments for each run, as in PhaseTimer.measure
+        self.profile(phase, fn, call_args(), kwargs)
+        if self.settings.sample_interval is not None:
+            self.sample(phase, fn, call_args(), kwargs)
@@ -0,0 +1,143 @@
+import heapq
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+from csr_graph import NODE_TYPE_CODES, CSRGraph
+from evaluation_cache import EvaluationCache
+
+
+def node_policy_class_distances(G, node, reachability, skip=()):
+    # One node's distances, from its successors' entries in the reachability table
+    node_distances = {}
+    if G.nodes[node]['type'] == 'PolicyClass':
+        node_distances[node] = 0
+    for successor in G.successors(node):
+        if successor in skip:
+            continue
+        for policy_class, distance in reachability[successor].items():
+            if distance + 1 < node_distances.get(policy_class, distance + 2):
+                node_distances[policy_class] = distance + 1
+    return node_distances
+
+def compute_policy_class_reachability(G, nodes=None, reachability=None):
+    # Shortest distance from every node to each policy class it can reach, computed
+    # once per graph over the SCC condensation in reverse topological order.
+    # Given nodes, only those are recomputed (in place) against the existing table,
+    # which is how incremental updates refresh the ancestors of a changed edge
+    if nodes is None:
+        C = nx.condensation(G)
+        reachability = {}
+    else:
+        C = nx.condensation(G.subgraph(nodes))
+
+    for component in reversed(list(nx.topological_sort(C))):
+        component_nodes = C.nodes[component]['members']
+        distances = {}
+
+        for node in component_nodes:
+            distances[node] = node_policy_class_distances(G, node, reachability, skip=component_nodes)
+
+        # Cyclic components need relaxing along their internal edges
+        if len(component_nodes) > 1:
+            heap = [(distance, node, policy_class)
+                    for node, node_distances in distances.items()
+                    for policy_class, distance in node_distances.items()]
+            heapq.heapify(heap)
+            while heap:
+                distance, node, policy_class = heapq.heappop(heap)
+                if distance > distances[node][policy_class]:
+                    continue
+                for predecessor in G.predecessors(node):
+                    if predecessor in component_nodes:
+                        if distance + 1 < distances[predecessor].get(policy_class, distance + 2):
+                            distances[predecessor][policy_class] = distance + 1
+                            heapq.heappush(heap, (distance + 1, predecessor, policy_class))
+
+        reachability.update(distances)
+
+    return reachability
+
+def _cached_policy_class_distances(cache, node):
+    return node_policy_class_distances(cache.G, node, cache)
+
+
+class _Cycle(Exception):
+    pass
+
+
+class PolicyClassCache(EvaluationCache):
+    # Lazily filled counterpart of compute_policy_class_reachability: a node's
+    # distances are computed from its successors' cached entries the first time
+    # anything above it asks for them. A node asked for again while its own entry
+    # is still being computed sits on a cycle, and the table is then filled for
+    # the whole graph over the SCC condensation instead
+    def __init__(self, G):
+        super().__init__(G, _cached_policy_class_distances)
+        self.pending = set()
+
+    def get(self, node):
+        if node in self.entries:
+            return super().get(node)
+        if node in self.pending:
+            raise _Cycle(node)
+
+        outermost = not self.pending
+        self.pending.add(node)
+        try:
+            return super().get(node)
+        except _Cycle:
+            if not outermost:
+                raise
+            self.entries = compute_policy_class_reachability(self.G)
+            return self.entries[node]
+        finally:
+            self.pending.discard(node)
+
+    __getitem__ = get
+
+
+def policy_class_cache(G):
+    return PolicyClassCache(G)
+
+def adjacency_matrix(G):
+    # Boolean CSR adjacency of G with the node names and type codes of its rows;
+    # a CSRGraph's own offset and target arrays are used as they are
+    if isinstance(G, CSRGraph):
+        num_nodes = G.num_nodes
+        A = sparse.csr_matrix((np.ones(len(G.targets), dtype=np.int32), G.targets, G.offsets),
+                              shape=(num_nodes, num_nodes))
+        return A, G.node_names, G.types
+
+    node_names = list(G.nodes())
+    node_ids = {node: i for i, node in enumerate(node_names)}
+    types = np.array([NODE_TYPE_CODES[data['type']] for _, data in G.nodes(data=True)], dtype=np.uint8)
+    sources = np.fromiter((node_ids[u] for u, _ in G.edges()), dtype=np.int32, count=G.number_of_edges())
+    targets = np.fromiter((node_ids[v] for _, v in G.edges()), dtype=np.int32, count=G.number_of_edges())
+    A = sparse.csr_matrix((np.ones(len(sources), dtype=np.int32), (sources, targets)),
+                          shape=(len(node_names), len(node_names)))
+    return A, node_names, types
+
+def sparse_policy_class_distances(G):
+    # Shortest hop count from every node to each policy class (-1 where it is not
+    # reachable), as a nodes x policy classes array. Starting from the policy class
+    # indicator columns, each product with the sparse adjacency moves the frontier
+    # one hop further up, so k products cover every node within k hops, and no
+    # users x resources matrix is ever formed
+    A, node_names, types = adjacency_matrix(G)
+    policy_class_ids = np.flatnonzero(types == NODE_TYPE_CODES['PolicyClass'])
+
+    distances = np.full((len(node_names), len(policy_class_ids)), -1, dtype=np.int32)
+    frontier = np.zeros(distances.shape, dtype=np.int32)
+    frontier[policy_class_ids, np.arange(len(policy_class_ids))] = 1
+    distances[frontier > 0] = 0
+
+    hops = 0
+    while frontier.any():
+        hops += 1
+        reached = (A @ frontier > 0) & (distances < 0)
+        distances[reached] = hops
+        frontier = reached.astype(np.int32)
+
+    return node_names, types, [node_names[i] for i in policy_class_ids], distances
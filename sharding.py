@@ -0,0 +1,176 @@
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from csr_graph import NODE_TYPE_CODES
+from escalation import batched_role_chain_escalation, role_chain_cache
+from incidence import Incidence, incidence_matrix, policy_class_hits
+from reachability import policy_class_cache
+from shared_graph import SharedGraph, attach_graph
+from snapshot import load_snapshot, save_snapshot
+
+POLICY_CLASS_NODES = ['IAM', 'EC2', 'S3', 'KMS', 'RDS']
+
+# Shard protocol: the coordinator publishes the read-only graph once as a
+# snapshot (type codes plus CSR or incidence arrays), and every shard is a plain
+# JSON task {'snapshot', 'model', 'shard', 'num_shards'}. Local workers can
+# instead get {'shared': handle} for a graph published with shared_graph.py and
+# attach to it without copying the arrays. A worker answers with a
+# JSON result holding its users' escalation_paths and its counts, so the same
+# tasks run in a local process pool, in separate local processes standing in for
+# nodes, or on other hosts that can read the snapshot path
+
+# Graphs this process has loaded or attached, with the incidence matrix of
+# hypergraphs and any shared memory blocks they are mapped from
+_loaded = {}
+
+
+def publish_graph(path, graph, **model):
+    # networkx graphs are stored in their CSR form, hypergraphs as incidence pairs
+    return save_snapshot(path, graph, **model)
+
+def shard_tasks(source, model, num_shards):
+    # source is a snapshot path or a shared_graph handle; model is 'abac' (role
+    # chains), 'ngac' (policy class reachability) or 'hypergraph' (single-hyperedge
+    # escalations)
+    key = 'snapshot' if isinstance(source, str) else 'shared'
+    return [{key: source, 'model': model, 'shard': shard, 'num_shards': num_shards}
+            for shard in range(num_shards)]
+
+def shard_users(users, shard, num_shards):
+    # Contiguous slice of the users in graph order, so shards differ by at most one user
+    return users[len(users) * shard // num_shards:len(users) * (shard + 1) // num_shards]
+
+def _load(task):
+    key = task['snapshot'] if 'snapshot' in task else json.dumps(task['shared'], sort_keys=True)
+    if key not in _loaded:
+        if 'snapshot' in task:
+            model, graph = load_snapshot(task['snapshot'])
+            blocks = []
+        else:
+            model, graph, blocks = attach_graph(task['shared'])
+        matrix = incidence_matrix(graph) if isinstance(graph, Incidence) else None
+        _loaded[key] = model, graph, matrix, blocks
+    return _loaded[key][:3]
+
+def run_shard(task):
+    model, graph, matrix = _load(task)
+    shard, num_shards = task['shard'], task['num_shards']
+    escalation_paths = {}
+    traversal_count = 0
+    path_length_sum = 0
+    path_count = 0
+
+    if task['model'] == 'hypergraph':
+        # Users are the nodes the hypergraph detectors pick out by name
+        node_names = np.array(graph.node_names, dtype=str)
+        rows = shard_users(np.flatnonzero(np.char.find(node_names, 'User_') >= 0), shard, num_shards)
+        users = [graph.node_names[row] for row in rows.tolist()]
+        escalation_paths, hit_counts = policy_class_hits(
+            graph, 'User_', model.get('policy_classes', POLICY_CLASS_NODES), matrix, rows)
+        # Every hit is a single-edge path
+        traversal_count = path_length_sum = path_count = sum(hit_counts.values())
+    else:
+        user_ids = np.flatnonzero(graph.types == NODE_TYPE_CODES['User'])
+        users = [graph.node_names[i] for i in shard_users(user_ids, shard, num_shards).tolist()]
+
+        if task['model'] == 'abac':
+            escalation_paths, traversal_count = batched_role_chain_escalation(graph, role_chain_cache(graph), users)
+            path_length_sum = sum(len(witness) for witness in escalation_paths.values())
+            path_count = len(escalation_paths)
+        else:
+            cache = policy_class_cache(graph)
+            for user in users:
+                for policy_class, distance in cache.get(user).items():
+                    traversal_count += 1
+                    escalation_paths[user] = policy_class
+                    path_length_sum += distance
+                    path_count += 1
+
+    # Per-user FP/FN against the generated ground truth, for models that have one
+    false_positives = false_negatives = None
+    ground_truth_paths = model.get('ground_truth_paths')
+    if ground_truth_paths is not None:
+        false_positives = len([user for user in escalation_paths if user not in ground_truth_paths])
+        false_negatives = len([user for user in users if user in ground_truth_paths and user not in escalation_paths])
+
+    return {'shard': shard, 'num_users': len(users), 'escalation_paths': escalation_paths,
+            'traversal_count': traversal_count, 'path_length_sum': path_length_sum, 'path_count': path_count,
+            'false_positives': false_positives, 'false_negatives': false_negatives}
+
+def merge_shard_results(results):
+    # (escalation_paths, path_complexity, traversal_count, false_positives,
+    # false_negatives) over all shards, with users in shard order; the FP/FN
+    # counts are None for models without a ground truth
+    results = sorted(results, key=lambda result: result['shard'])
+    escalation_paths = {}
+    for result in results:
+        escalation_paths.update(result['escalation_paths'])
+
+    path_count = sum(result['path_count'] for result in results)
+    path_complexity = sum(result['path_length_sum'] for result in results) / path_count if path_count else 0
+    traversal_count = sum(result['traversal_count'] for result in results)
+
+    def total(key):
+        if any(result[key] is None for result in results):
+            return None
+        return sum(result[key] for result in results)
+
+    return escalation_paths, path_complexity, traversal_count, total('false_positives'), total('false_negatives')
+
+def run_sharded(snapshot, model, num_shards, workers=None, shared=False):
+    # Shards over a local process pool; each worker loads the snapshot once and
+    # keeps it for every further shard it is given. With shared, the snapshot is
+    # loaded once here and published into shared memory, and the workers attach
+    # to that single copy instead of each reading their own
+    if not shared:
+        with ProcessPoolExecutor(max_workers=workers or num_shards) as pool:
+            results = list(pool.map(run_shard, shard_tasks(snapshot, model, num_shards)))
+        return merge_shard_results(results)
+
+    graph_model, graph = load_snapshot(snapshot)
+    with SharedGraph(graph, **graph_model) as published:
+        with ProcessPoolExecutor(max_workers=workers or num_shards) as pool:
+            results = list(pool.map(run_shard, shard_tasks(published.handle, model, num_shards)))
+    return merge_shard_results(results)
+
+def run_shard_file(task_file, result_file):
+    # Node entry point: one JSON task in, one JSON result out
+    with open(task_file) as file:
+        task = json.load(file)
+    result = run_shard(task)
+
+    partial_file = result_file + '.partial'
+    with open(partial_file, 'w') as file:
+        json.dump(result, file)
+    os.replace(partial_file, result_file)
+    return result_file
+
+def run_sharded_nodes(snapshot, model, num_nodes, work_dir):
+    # Every shard runs in a separate local process that, like a remote node, only
+    # gets a task file and the snapshot path and hands back a result file
+    os.makedirs(work_dir, exist_ok=True)
+    processes = []
+    for task in shard_tasks(snapshot, model, num_nodes):
+        task_file = os.path.join(work_dir, f"shard_{task['shard']}_task.json")
+        result_file = os.path.join(work_dir, f"shard_{task['shard']}_result.json")
+        with open(task_file, 'w') as file:
+            json.dump(task, file)
+        processes.append((subprocess.Popen([sys.executable, os.path.abspath(__file__), task_file, result_file]),
+                          result_file))
+
+    results = []
+    for process, result_file in processes:
+        if process.wait() != 0:
+            raise RuntimeError(f"Shard node for {result_file} exited with status {process.returncode}")
+        with open(result_file) as file:
+            results.append(json.load(file))
+    return merge_shard_results(results)
+
+
+if __name__ == "__main__":
+    run_shard_file(sys.argv[1], sys.argv[2])
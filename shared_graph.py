@@ -0,0 +1,100 @@
+import json
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from snapshot import graph_arrays, graph_from_arrays
+
+# A published graph is the array form of snapshot.py (node type codes, CSR
+# offsets/targets or hyperedge incidence pairs, plus encoded names and node data)
+# placed once in shared memory blocks or in a directory of .npy files. Workers
+# get a small JSON-able handle and attach to it: the integer arrays are numpy
+# views on the shared pages rather than copies, and only the node names are
+# decoded into Python strings per process
+
+
+def _arrays(graph, model):
+    kind, arrays = graph_arrays(graph)
+    arrays = dict(arrays)
+    arrays['model'] = np.frombuffer(json.dumps(model).encode(), dtype=np.uint8)
+    return kind, arrays
+
+def _attach_block(name):
+    # Attaching must not register the block with this process's resource tracker,
+    # which would unlink it when the worker exits, while the owner still serves it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching always registers, so registration is skipped
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedGraph:
+    # Owner of a graph published into shared memory. The blocks live until close(),
+    # which unlinks them; attached workers keep their mappings until they close them
+    def __init__(self, graph, **model):
+        kind, arrays = _arrays(graph, model)
+        self.blocks = []
+        self.handle = {'kind': kind, 'arrays': {}}
+
+        for name, array in arrays.items():
+            # Zero-size blocks are not allowed, so empty arrays get one spare byte
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.handle['arrays'][name] = {'shm': block.name, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+    def nbytes(self):
+        return sum(block.size for block in self.blocks)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def publish_mmap(directory, graph, **model):
+    # Writes the arrays as .npy files that workers memory-map read-only; the page
+    # cache then holds the one resident copy, which also outlives this process
+    kind, arrays = _arrays(graph, model)
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    with open(os.path.join(directory, 'graph.json'), 'w') as file:
+        json.dump({'kind': kind, 'arrays': sorted(arrays)}, file)
+    return {'kind': kind, 'directory': directory}
+
+def attach_graph(handle):
+    # Returns (model, graph, blocks) for a SharedGraph.handle or a publish_mmap
+    # handle. graph is a CSRGraph or an Incidence over the shared arrays; blocks
+    # must be kept referenced (and closed when done) for as long as graph is used
+    blocks = []
+    arrays = {}
+    if 'directory' in handle:
+        with open(os.path.join(handle['directory'], 'graph.json')) as file:
+            names = json.load(file)['arrays']
+        for name in names:
+            arrays[name] = np.load(os.path.join(handle['directory'], f'{name}.npy'), mmap_mode='r')
+    else:
+        for name, spec in handle['arrays'].items():
+            block = _attach_block(spec['shm'])
+            blocks.append(block)
+            array = np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=block.buf)
+            array.flags.writeable = False
+            arrays[name] = array
+
+    model = json.loads(arrays.pop('model').tobytes().decode())
+    return model, graph_from_arrays(handle['kind'], arrays), blocks
@@ -0,0 +1,122 @@
+import json
+import os
+
+import numpy as np
+
+from csr_graph import NODE_TYPES, CSRGraph, CSRGraphBuilder
+from incidence import Incidence, hypergraph_from_incidence, incidence_from_hypergraph
+
+# Snapshots are uncompressed .npz files: node names as one newline-joined UTF-8
+# buffer, integer arrays for the graph structure and the generated model
+# (users, resources, permissions, policy classes, ground truth, ...) as JSON
+
+
+def _encode_strings(strings):
+    return np.frombuffer('\n'.join(strings).encode(), dtype=np.uint8)
+
+def _decode_strings(buffer):
+    text = buffer.tobytes().decode()
+    return text.split('\n') if text else []
+
+def _encode_json(value):
+    return np.frombuffer(json.dumps(value).encode(), dtype=np.uint8)
+
+def _decode_json(buffer):
+    return json.loads(buffer.tobytes().decode())
+
+def snapshot_path(snapshot_dir, name, sizes, seed):
+    return os.path.join(snapshot_dir, f"{name}_{'_'.join(str(size) for size in sizes)}_{seed}.npz")
+
+def graph_arrays(graph):
+    # (kind, {name: array}) of the compact form of a graph, with node names and
+    # node data encoded as uint8 buffers
+    if isinstance(graph, CSRGraphBuilder):
+        graph = graph.to_graph()
+
+    if isinstance(graph, CSRGraph):
+        return 'digraph', {
+            'node_names': _encode_strings(graph.node_names),
+            'types': graph.types,
+            'offsets': graph.offsets,
+            'targets': graph.targets,
+            'node_data': _encode_json(graph.node_data),
+        }
+
+    if isinstance(graph, Incidence) or hasattr(graph, 'incidence_dict'):
+        incidence = graph if isinstance(graph, Incidence) else incidence_from_hypergraph(graph)
+        return 'hypergraph', {
+            'edge_names': _encode_strings(incidence.edge_names),
+            'node_names': _encode_strings(incidence.node_names),
+            'edge_ids': incidence.edge_ids,
+            'node_ids': incidence.node_ids,
+        }
+
+    # networkx DiGraph
+    builder = CSRGraphBuilder()
+    for node, data in graph.nodes(data=True):
+        builder.add_node(node, **data)
+    builder.add_edges_from(graph.edges())
+    return graph_arrays(builder.to_graph())
+
+def graph_from_arrays(kind, arrays):
+    # CSRGraph or Incidence over the arrays of graph_arrays, without copying them
+    if kind == 'hypergraph':
+        return Incidence(_decode_strings(arrays['edge_names']), _decode_strings(arrays['node_names']),
+                         arrays['edge_ids'], arrays['node_ids'])
+    return CSRGraph(_decode_strings(arrays['node_names']), arrays['types'], arrays['offsets'], arrays['targets'],
+                    node_data=_decode_json(arrays['node_data']))
+
+def save_snapshot(path, graph, **model):
+    kind, arrays = graph_arrays(graph)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Written beside the final path and moved into place, so an interrupted save
+    # never leaves a truncated snapshot for load_or_generate to pick up
+    partial_file = path + '.partial'
+    with open(partial_file, 'wb') as file:
+        np.savez(file, kind=np.frombuffer(kind.encode(), dtype=np.uint8), model=_encode_json(model), **arrays)
+    os.replace(partial_file, path)
+    return path
+
+def load_snapshot(path, backend=None):
+    # Returns (model, graph). Directed graphs load as a CSRGraph by default or
+    # backend='networkx'; hypergraphs load as an Incidence by default or
+    # backend='hypernetx', which rebuilds the (much slower) hnx.Hypergraph
+    with np.load(path, allow_pickle=False) as snapshot:
+        kind = snapshot['kind'].tobytes().decode()
+        model = _decode_json(snapshot['model'])
+
+        graph = graph_from_arrays(kind, {name: snapshot[name] for name in snapshot.files})
+
+    if kind == 'hypergraph':
+        if backend == 'hypernetx':
+            return model, hypergraph_from_incidence(graph)
+        return model, graph
+
+    if backend == 'networkx':
+        import networkx as nx
+
+        G = nx.DiGraph()
+        G.add_nodes_from((name, {'type': NODE_TYPES[code], **graph.node_data.get(name, {})})
+                         for name, code in zip(graph.node_names, graph.types.tolist()))
+        G.add_edges_from(graph.edges())
+        return model, G
+
+    return model, graph
+
+def load_or_generate(snapshot_dir, name, sizes, seed, generate, backend=None):
+    # Reuse the snapshot for (sizes, seed) when there is one, otherwise call
+    # generate() -> (model dict, graph) and save it for the next run. The key
+    # leaves out the backend on purpose: a seed generates the same model under
+    # every backend, and the snapshot holds only the compact graph form, so one
+    # snapshot serves all backends and backend only picks the loaded form
+    path = snapshot_path(snapshot_dir, name, sizes, seed)
+    if os.path.exists(path):
+        return load_snapshot(path, backend)
+
+    model, graph = generate()
+    save_snapshot(path, graph, **model)
+    return model, graph
@@ -0,0 +1,132 @@
+import csv
+import gzip
+from collections import Counter
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+
+def make_rng(rng=None):
+    # Generators take a seed or a random.Random instance; None keeps the global module
+    if rng is None:
+        return random
+    if isinstance(rng, random.Random):
+        return rng
+    return random.Random(rng)
+
+def job_seeds(seed, num_jobs):
+    rng = random.Random(seed)
+    return [rng.getrandbits(32) for _ in range(num_jobs)]
+
+def sweep_jobs(log_ranges, repetitions, seed):
+    jobs = [(repetition, tuple(sizes)) for repetition in range(repetitions) for sizes in log_ranges]
+    return [(repetition, sizes, job_seed) for (repetition, sizes), job_seed in zip(jobs, job_seeds(seed, len(jobs)))]
+
+def _run_job(run_configuration, options, job):
+    repetition, sizes, job_seed = job
+    # Every job generates from its own seed, so a row is reproducible no matter
+    # which worker ran it or how many workers there are
+    return repetition, run_configuration(*sizes, seed=job_seed, **options)
+
+def run_sweep(run_configuration, log_ranges, repetitions, workers=1, seed=None, skip=(), **options):
+    # Yields (repetition, row) for every (repetition, size tuple) job not in skip,
+    # repetitions outermost, in the same order as the serial loops regardless of
+    # the number of workers. Seeds are drawn for all jobs before skipping, so a
+    # resumed sweep with the same seed regenerates the same graphs
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(32)
+
+    jobs = [job for job in sweep_jobs(log_ranges, repetitions, seed) if job[:2] not in skip]
+    run_job = partial(_run_job, run_configuration, options)
+
+    if workers == 1:
+        yield from map(run_job, jobs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(run_job, jobs)
+
+def _open_results(csv_file, mode, compressed=None):
+    if compressed is None:
+        compressed = csv_file.endswith('.gz')
+    if compressed:
+        return gzip.open(csv_file, mode + 't', newline='')
+    return open(csv_file, mode, newline='')
+
+def _read_complete_rows(csv_file, header):
+    # Rows of an earlier, possibly interrupted, run of the same sweep; a torn
+    # last line or a truncated gzip member ends the read
+    rows = []
+    try:
+        with _open_results(csv_file, 'r') as file:
+            reader = csv.reader(file)
+            if next(reader, None) != header:
+                raise ValueError(f"{csv_file} was written with a different header")
+            for row in reader:
+                rows.append(row)
+    except (EOFError, gzip.BadGzipFile):
+        pass
+
+    if rows and len(rows[-1]) != len(header):
+        rows.pop()
+    return rows
+
+def write_sweep(csv_file, header, run_configuration, log_ranges, repetitions, workers=1, seed=None,
+                resume=False, compress=False, rows_per_job=1, **options):
+    # Streams every row to csv_file as soon as it completes. With resume, rows
+    # already in csv_file are kept and their (repetition, size tuple) jobs are
+    # skipped; compress writes a gzip CSV instead. With rows_per_job > 1,
+    # run_configuration returns a list of that many rows, and a resumed job
+    # missing any of them is rerun whole. Resuming needs the seed of the run it
+    # continues, since the remaining jobs' seeds are drawn from it
+    if resume and seed is None:
+        raise ValueError("resume=True needs the seed of the sweep being resumed")
+    if compress and not csv_file.endswith('.gz'):
+        csv_file += '.gz'
+    header = header + ['Repetition']
+
+    completed = set()
+    if resume and os.path.exists(csv_file):
+        rows = _read_complete_rows(csv_file, header)
+        size_columns = [i for i, column in enumerate(header) if column.startswith('Num_')]
+
+        def job_key(row):
+            return int(row[-1]), tuple(int(row[i]) for i in size_columns)
+
+        row_counts = Counter(job_key(row) for row in rows)
+        rows = [row for row in rows if row_counts[job_key(row)] == rows_per_job]
+        completed = {job_key(row) for row in rows}
+
+        # Rewrite the intact rows so appending never follows a torn line or member
+        partial_file = csv_file + '.partial'
+        with _open_results(partial_file, 'w', csv_file.endswith('.gz')) as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+        os.replace(partial_file, csv_file)
+    else:
+        with _open_results(csv_file, 'w') as file:
+            csv.writer(file).writerow(header)
+
+    with _open_results(csv_file, 'a') as file:
+        writer = csv.writer(file)
+        for repetition, rows in run_sweep(run_configuration, log_ranges, repetitions, workers=workers, seed=seed,
+                                          skip=completed, **options):
+            if rows_per_job == 1:
+                rows = [rows]
+            writer.writerows(row + [repetition] for row in rows)
+            file.flush()
+
+    return csv_file
+
+def load_row_configuration(csv_file, row_number):
+    # Size tuple and seed of one data row (numbered from 1, after the header), from
+    # a plain or gzip results file
+    with _open_results(csv_file, 'r') as file:
+        for number, row in enumerate(csv.DictReader(file), start=1):
+            if number == row_number:
+                sizes = tuple(int(value) for column, value in row.items() if column.startswith('Num_'))
+                return sizes, int(row['Seed'])
+
+    raise IndexError(f"{csv_file} has no row {row_number}")
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from benchmark import load_script
+from escalation import role_chain_cache
+
+abac_dag = load_script('abac-dag.py')
+pam_abac = load_script('pam-abac.py')
+
+
+@pytest.fixture
+def escalation_graph():
+    # A built ABAC graph with IAMRole -> Role edges, which the generator never adds
+    rng = random.Random(5)
+    users, roles, resources, policies, G = abac_dag.generate_abac_model(150, 40, 90, rng=21)
+    G = abac_dag.build_abac_graph(G, roles, resources)
+    for resource, res_type in resources.items():
+        if res_type == 'IAMRole':
+            for role in rng.sample(list(roles), 2):
+                G.add_edge(resource, role)
+    return G
+
+
+def test_batched_build_adds_the_same_edges():
+    users, roles, resources, policies, G = abac_dag.generate_abac_model(150, 40, 90, rng=21)
+    nested = abac_dag.build_abac_graph(G.copy(), roles, resources)
+    batched = abac_dag.build_abac_graph_batched(G.copy(), roles, resources)
+    assert set(batched.edges()) == set(nested.edges())
+    assert nested.number_of_edges() > G.number_of_edges()
+
+@pytest.mark.parametrize('detector', ['batched', 'cached'])
+def test_abac_dag_detectors_match_the_nested_walk(escalation_graph, detector):
+    nested = abac_dag.detect_privilege_escalation(escalation_graph)
+    detect = getattr(abac_dag, f'detect_privilege_escalation_{detector}')
+    assert nested[0]
+    assert detect(escalation_graph) == nested
+
+def test_pam_abac_detectors_match_the_nested_walk():
+    model, G = pam_abac.generate_policy_graph(150, 40, 90, seed=8)
+    nested = pam_abac.detect_privilege_escalation(G)
+    assert nested == model['ground_truth_paths']
+    assert pam_abac.detect_privilege_escalation_batched(G) == nested
+    assert pam_abac.detect_privilege_escalation_cached(G) == nested
+
+def test_invalidated_cache_matches_the_nested_walk(escalation_graph):
+    G = escalation_graph
+    cache = role_chain_cache(G)
+    before = abac_dag.detect_privilege_escalation_cached(G, cache)
+
+    # Revoke RunInstances from the roles the witnesses end in
+    for role in {witness[2] for witness in before[0].values()}:
+        G.nodes[role]['permissions'] = [p for p in G.nodes[role]['permissions'] if p != 'ec2:RunInstances']
+        cache.node_changed(role)
+    revoked = abac_dag.detect_privilege_escalation_cached(G, cache)
+    assert revoked == abac_dag.detect_privilege_escalation(G)
+    assert revoked != before
+
+    # Unlink the first witness's IAMRole from its role
+    role, resource, _ = next(iter(revoked[0].values()))
+    G.remove_edge(role, resource)
+    cache.edge_changed(role, resource)
+    unlinked = abac_dag.detect_privilege_escalation_cached(G, cache)
+    assert unlinked == abac_dag.detect_privilege_escalation(G)
+    assert unlinked != revoked
+    assert cache.hits > 0
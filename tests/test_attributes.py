@@ -0,0 +1,37 @@
+import pytest
+
+from attributes import AttributeTable
+from benchmark import load_script
+from footprint import memory_footprint
+
+ngac_dag = load_script('ngac-dag-policy-full-model.py')
+
+
+def test_shared_mode_reuses_one_interned_node():
+    table = AttributeTable('shared')
+    first = table.node('User_0', 'UserType', 'Admin')
+    assert first == 'UserType:Admin'
+    assert table.node('User_1', 'UserType', 'Admin') is first
+    assert table.node('User_1', 'AuthType', 'MFA') == 'AuthType:MFA'
+    assert len(table) == 2
+
+def test_per_entity_mode_gives_each_entity_its_node():
+    table = AttributeTable('per_entity')
+    assert table.node('User_0', 'UserType', 'Admin') == 'User_0_UserType:Admin'
+    assert table.node('User_1', 'UserType', 'Admin') == 'User_1_UserType:Admin'
+    assert len(table) == 1
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        AttributeTable('global')
+
+def test_shared_attributes_shrink_the_ngac_dag_without_changing_detection():
+    shared = ngac_dag.generate_policy_graph(60, 3, 30, 3, 5, seed=2, attributes='shared')[1]
+    per_entity = ngac_dag.generate_policy_graph(60, 3, 30, 3, 5, seed=2, attributes='per_entity')[1]
+    assert shared.number_of_nodes() < per_entity.number_of_nodes()
+    assert memory_footprint(shared) < memory_footprint(per_entity)
+
+    paths, path_complexity, traversal_count = ngac_dag.detect_privilege_escalation(shared)
+    per_entity_paths, per_entity_complexity, per_entity_count = ngac_dag.detect_privilege_escalation(per_entity)
+    assert paths.keys() == per_entity_paths.keys()
+    assert (path_complexity, traversal_count) == (per_entity_complexity, per_entity_count)
@@ -0,0 +1,24 @@
+import csv
+
+import pytest
+
+from benchmark import fit_growth_exponents
+
+
+def test_growth_exponent_of_a_power_law(tmp_path):
+    csv_file = str(tmp_path / 'results.csv')
+    with open(csv_file, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Model', 'Num_Users', 'Detection_Time', 'Graph_Size'])
+        for users in [10, 100, 1000, 10000]:
+            writer.writerow(['NGAC_DAG', users, 3 * users ** 1.5, 5 * users])
+            writer.writerow(['ABAC', users, 0.5 * users, ''])
+        # A row without a positive value is left out of the fit
+        writer.writerow(['ABAC', 100000, 0, ''])
+
+    fits = {(model, metric): fit for model, metric, *fit in
+            fit_growth_exponents(csv_file, ['Detection_Time', 'Graph_Size'])}
+    assert fits[('NGAC_DAG', 'Detection_Time')] == pytest.approx([1.5, 3, 1, 4])
+    assert fits[('NGAC_DAG', 'Graph_Size')] == pytest.approx([1, 5, 1, 4])
+    assert fits[('ABAC', 'Detection_Time')] == pytest.approx([1, 0.5, 1, 4])
+    assert ('ABAC', 'Graph_Size') not in fits
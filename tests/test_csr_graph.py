@@ -0,0 +1,35 @@
+import pytest
+
+from benchmark import load_script
+from csr_graph import CSRGraph, CSRGraphBuilder
+
+ngac_dag = load_script('ngac-dag-policy-full-model.py')
+
+
+@pytest.fixture(scope='module')
+def graphs():
+    G = ngac_dag.generate_policy_graph(40, 3, 20, 3, 5, backend='networkx', seed=9)[1]
+    csr = ngac_dag.generate_policy_graph(40, 3, 20, 3, 5, backend='csr', seed=9)[1]
+    return G, csr
+
+
+def test_csr_build_matches_networkx(graphs):
+    G, csr = graphs
+    assert isinstance(csr, CSRGraph)
+    assert list(csr.nodes(data=True)) == list(G.nodes(data=True))
+    assert csr.number_of_edges() == G.number_of_edges()
+    for node in G:
+        assert list(csr.successors(node)) == list(G.successors(node))
+        assert sorted(csr.predecessors(node)) == sorted(G.predecessors(node))
+        assert csr.nodes[node] == G.nodes[node]
+
+def test_csr_detection_matches_networkx(graphs):
+    G, csr = graphs
+    assert ngac_dag.detect_privilege_escalation(csr) == ngac_dag.detect_privilege_escalation(G)
+
+def test_untyped_nodes_are_rejected():
+    builder = CSRGraphBuilder()
+    builder.add_node('User_0', type='User')
+    builder.add_edge('User_0', 'UA_0')
+    with pytest.raises(ValueError):
+        builder.to_graph()
@@ -0,0 +1,79 @@
+import networkx as nx
+import pytest
+
+from benchmark import load_script
+from escalation import ESCALATION_PATTERNS, PatternAutomaton, parse_pattern
+
+abac_dag = load_script('abac-dag.py')
+pam_abac = load_script('pam-abac.py')
+
+# One user per pattern, with the path the pattern reports after the user
+MATCHES = {
+    'PassRole_RunInstances': {'User_0': ('Role_Pass', 'IAMRole_0', 'Role_Run')},
+    'PassRole_EC2Instance': {'User_1': ('Role_PassRun', 'EC2_0')},
+    'AttachRolePolicy': {'User_2': ('Role_Attach', 'IAMRole_1'), 'User_5': ('Role_AttachChain', 'IAMRole_3')},
+    'UpdateAssumeRolePolicy': {'User_3': ('Role_Trust', 'IAMRole_1')},
+    'UpdateRole_PassRole': {'User_4': ('Role_Update', 'IAMRole_2', 'Role_PassOnly')},
+    'AttachRolePolicy_Chain': {'User_5': ('Role_AttachChain', 'IAMRole_3', 'Role_PassChain', 'IAMRole_4')},
+}
+
+
+def pattern_graph():
+    G = nx.DiGraph()
+    roles = {
+        'Role_Pass': ['iam:PassRole'], 'Role_Run': ['ec2:RunInstances'],
+        'Role_PassRun': ['iam:PassRole', 'ec2:RunInstances'], 'Role_Attach': ['iam:AttachRolePolicy'],
+        'Role_Trust': ['iam:UpdateAssumeRolePolicy'], 'Role_Update': ['iam:UpdateRole'],
+        'Role_PassOnly': ['iam:PassRole'], 'Role_AttachChain': ['iam:AttachRolePolicy'],
+        'Role_PassChain': ['iam:PassRole'], 'Role_PassS3': ['iam:PassRole'], 'Role_S3': ['s3:PutObject'],
+    }
+    for role, permissions in roles.items():
+        G.add_node(role, type='Role', permissions=permissions)
+    for user in range(9):
+        G.add_node(f'User_{user}', type='User')
+    for resource in range(6):
+        G.add_node(f'IAMRole_{resource}', type='IAMRole')
+    G.add_node('EC2_0', type='EC2Instance')
+    G.add_node('S3_0', type='S3Bucket')
+
+    G.add_edges_from([
+        ('User_0', 'Role_Pass'), ('Role_Pass', 'IAMRole_0'), ('IAMRole_0', 'Role_Run'),
+        ('User_1', 'Role_PassRun'), ('Role_PassRun', 'EC2_0'),
+        ('User_2', 'Role_Attach'), ('Role_Attach', 'IAMRole_1'),
+        ('User_3', 'Role_Trust'), ('Role_Trust', 'IAMRole_1'),
+        ('User_4', 'Role_Update'), ('Role_Update', 'IAMRole_2'), ('IAMRole_2', 'Role_PassOnly'),
+        ('User_5', 'Role_AttachChain'), ('Role_AttachChain', 'IAMRole_3'), ('IAMRole_3', 'Role_PassChain'),
+        ('Role_PassChain', 'IAMRole_4'),
+        # Near misses: the next role cannot run instances, a RunInstances-only role
+        # reaches an instance, and a user holds a bucket directly
+        ('User_6', 'Role_PassS3'), ('Role_PassS3', 'IAMRole_5'), ('IAMRole_5', 'Role_S3'),
+        ('User_7', 'Role_Run'), ('Role_Run', 'EC2_0'),
+        ('User_8', 'S3_0'),
+    ])
+    return G
+
+
+def test_every_pattern_matches_only_its_users():
+    matches, evaluated = PatternAutomaton(ESCALATION_PATTERNS).match(pattern_graph())
+    assert matches == MATCHES
+    assert evaluated > 0
+
+@pytest.mark.parametrize('name', list(ESCALATION_PATTERNS))
+def test_single_pattern_automaton_matches_the_catalogue(name):
+    matches, _ = PatternAutomaton({name: ESCALATION_PATTERNS[name]}).match(pattern_graph())
+    assert matches == {name: MATCHES[name]}
+
+@pytest.mark.parametrize('pattern', ['User -> Group -> IAMRole', 'User -> Role[iam:PassRole -> IAMRole'])
+def test_malformed_patterns_are_rejected(pattern):
+    with pytest.raises(ValueError):
+        parse_pattern(pattern)
+
+def test_generated_models_match_their_part_of_the_catalogue():
+    abac_graph = abac_dag.generate_policy_graph(200, 30, 60, seed=4)[1]
+    abac_matches, _ = abac_dag.detect_escalation_patterns(abac_graph)
+    assert {name for patterns in abac_matches.values() for name in patterns} == \
+        {'PassRole_EC2Instance', 'AttachRolePolicy', 'UpdateAssumeRolePolicy'}
+
+    pam_graph = pam_abac.generate_policy_graph(200, 30, 60, seed=4)[1]
+    pam_matches = pam_abac.detect_escalation_patterns(pam_graph)
+    assert {name for patterns in pam_matches.values() for name in patterns} == {'PassRole_RunInstances'}
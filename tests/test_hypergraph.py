@@ -0,0 +1,62 @@
+import pytest
+
+from benchmark import load_script
+from incidence import IncidenceBuilder, hypergraph_from_incidence, policy_class_paths
+
+fn_fr = load_script('ngac-hypergraph-fn-fr.py')
+fixed = load_script('ngac-hypergraph-fixed.py')
+
+USERS = ['User_0', 'User_1', 'User_2', 'User_3']
+LAYERS = [USERS, ['iam:PassRole', 's3:PutObject', 'ec2:RunInstances'], ['Resource_0', 'Resource_1', 'Resource_2']]
+PATHS = {
+    'User_0': ['User_0', 'Edge_User_0', 'Resource_0', 'Edge_PC_0', 'S3'],
+    'User_1': ['User_1', 'Edge_User_1', 's3:PutObject', 'Edge_Perm_1', 'Resource_1', 'Edge_PC_1', 'IAM'],
+}
+
+
+def hand_built_incidence():
+    # User_0 holds a resource linked to S3, User_1 a permission on a resource linked
+    # to IAM. User_2 reaches IAM only through an attribute node, and User_3 only by
+    # doubling back from Resource_2 to a permission, so neither is flagged
+    builder = IncidenceBuilder()
+    builder.add_edge('Edge_User_0', ('User_0', 'iam:PassRole', 'Resource_0'))
+    builder.add_edge('Edge_User_1', ('User_1', 's3:PutObject'))
+    builder.add_edge('Edge_User_2', ('User_2', 'User_2_UserType:Admin'))
+    builder.add_edge('Edge_User_3', ('User_3', 'Resource_2'))
+    builder.add_edge('Edge_Perm_0', ('iam:PassRole', 'Resource_1'))
+    builder.add_edge('Edge_Perm_1', ('s3:PutObject', 'Resource_1'))
+    builder.add_edge('Edge_Perm_2', ('ec2:RunInstances', 'Resource_1'))
+    builder.add_edge('Edge_Perm_3', ('ec2:RunInstances', 'Resource_2'))
+    builder.add_edge('Edge_Attribute', ('User_2_UserType:Admin', 'IAM'))
+    builder.add_edge('Edge_PC_0', ('Resource_0', 'S3'))
+    builder.add_edge('Edge_PC_1', ('Resource_1', 'IAM'))
+    return builder.to_incidence()
+
+
+def test_sparse_detector_matches_hypernetx():
+    users, resources, permissions, policy_classes, incidence, ground_truth_paths = fn_fr.generate_ngac_incidence(
+        80, 3, 40, 3, 6, rng=17)
+    H = hypergraph_from_incidence(incidence)
+    # Drop some true paths and add a user without one, so FP and FN are both non-zero
+    truth = dict(list(ground_truth_paths.items())[5:])
+    truth[next(user for user in users if user not in ground_truth_paths)] = 'IAM'
+
+    expected = fn_fr.detect_privilege_escalation(H, truth)
+    assert fn_fr.detect_privilege_escalation_sparse(incidence, truth) == expected
+    assert expected[3] > 0 and expected[4] > 0
+
+@pytest.mark.parametrize('max_depth, expected', [(1, []), (2, ['User_0']), (3, ['User_0', 'User_1']),
+                                                 (4, ['User_0', 'User_1'])])
+def test_policy_class_paths_follow_the_layers(max_depth, expected):
+    paths, expanded = policy_class_paths(hand_built_incidence(), USERS, fixed.POLICY_CLASS_NODES, max_depth, LAYERS)
+    assert paths == {user: PATHS[user] for user in expected}
+
+@pytest.mark.parametrize('backend', ['sparse', 'hypernetx'])
+def test_multi_hop_detector_reports_path_depths(backend):
+    incidence = hand_built_incidence()
+    H = incidence if backend == 'sparse' else hypergraph_from_incidence(incidence)
+    paths, path_complexity, traversal_count = fixed.detect_privilege_escalation_multi_hop(H, USERS, LAYERS, max_depth=4)
+    assert paths == PATHS
+    # Two and three hyperedges
+    assert path_complexity == 2.5
+    assert traversal_count > 0
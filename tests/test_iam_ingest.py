@@ -0,0 +1,72 @@
+import networkx as nx
+import pytest
+
+from iam_ingest import IAMInventory, generate_inventory, policy_statements, read_authorization_details, \
+    write_authorization_details
+
+ACCOUNT = '123456789012'
+ROLE_ARN = f'arn:aws:iam::{ACCOUNT}:role/target'
+USER_ARN = f'arn:aws:iam::{ACCOUNT}:user/alice'
+
+
+def inventory(*statements, trust=None):
+    # One user with the given inline statements, and one role the user may assume
+    inventory = IAMInventory()
+    inventory.add('UserDetailList', {
+        'UserName': 'alice', 'Arn': USER_ARN,
+        'UserPolicyList': [{'PolicyName': 'inline', 'PolicyDocument': {'Statement': list(statements)}}]})
+    inventory.add('RoleDetailList', {
+        'RoleName': 'target', 'Arn': ROLE_ARN,
+        'AssumeRolePolicyDocument': trust or {'Statement': [
+            {'Effect': 'Allow', 'Principal': {'AWS': USER_ARN}, 'Action': 'sts:AssumeRole'}]}})
+    return inventory
+
+def user_grants(inventory):
+    return inventory.resolve()[('user', 'alice')]
+
+
+def test_allow_grants_pass_role():
+    grants = user_grants(inventory({'Effect': 'Allow', 'Action': 'iam:PassRole', 'Resource': '*'}))
+    assert grants == {('iam:PassRole', ROLE_ARN)}
+
+def test_deny_overrides_allow():
+    grants = user_grants(inventory({'Effect': 'Allow', 'Action': 'iam:PassRole', 'Resource': '*'},
+                                   {'Effect': 'Deny', 'Action': 'iam:PassRole', 'Resource': '*'}))
+    assert grants == set()
+
+def test_deny_in_group_policy_overrides_user_allow():
+    inv = inventory({'Effect': 'Allow', 'Action': 'iam:*', 'Resource': '*'})
+    inv.users['alice']['Groups'] = ('locked',)
+    inv.add('GroupDetailList', {'GroupName': 'locked', 'GroupPolicyList': [{'PolicyName': 'deny', 'PolicyDocument': {
+        'Statement': {'Effect': 'Deny', 'Action': 'iam:PassRole', 'Resource': ROLE_ARN}}}]})
+    assert ('iam:PassRole', ROLE_ARN) not in user_grants(inv)
+    assert ('iam:UpdateRole', ROLE_ARN) in user_grants(inv)
+
+def test_not_action_covers_the_other_tracked_actions():
+    statements = policy_statements({'Statement': {'Effect': 'Allow', 'NotAction': 'iam:*', 'Resource': '*'}})
+    assert statements == [('Allow', ('ec2:RunInstances', 's3:PutObject'), ('*',), False)]
+
+def test_not_resource_excludes_the_named_resources():
+    grants = user_grants(inventory({'Effect': 'Allow', 'Action': 'iam:PassRole', 'NotResource': ROLE_ARN}))
+    assert grants == set()
+
+def test_denied_principal_is_not_trusted():
+    inv = inventory(trust={'Statement': [
+        {'Effect': 'Allow', 'Principal': {'AWS': USER_ARN}, 'Action': 'sts:AssumeRole'},
+        {'Effect': 'Deny', 'Principal': {'AWS': USER_ARN}, 'Action': 'sts:AssumeRole'}]})
+    assert inv.assumable_roles('alice') == []
+
+def test_unknown_effect_is_rejected():
+    with pytest.raises(ValueError):
+        policy_statements({'Statement': {'Effect': 'Maybe', 'Action': 'iam:PassRole', 'Resource': '*'}})
+
+def test_streamed_export_matches_generated_inventory(tmp_path):
+    path = write_authorization_details(str(tmp_path / 'details.json.gz'), 40, 6, 4, 30, rng=7)
+    streamed = read_authorization_details(path, chunk_size=256)
+    assert streamed.resolve() == generate_inventory(40, 6, 4, 30, rng=7).resolve()
+
+def test_users_reach_only_granted_resources_in_the_ngac_dag():
+    # A user without grants must not reach resources through a shared attribute node
+    inv = inventory({'Effect': 'Deny', 'Action': '*', 'Resource': '*'}, trust={'Statement': []})
+    users, resources, permissions, policy_classes, G = inv.ngac_dag_model(attributes='shared')
+    assert not any(node.startswith('Resource_') for node in nx.descendants(G, 'User_alice'))
@@ -0,0 +1,77 @@
+import random
+
+import networkx as nx
+import pytest
+
+from benchmark import load_script
+from incremental import IncrementalABACDetector, IncrementalNGACDetector
+
+abac_dag = load_script('abac-dag.py')
+ngac_dag = load_script('ngac-dag-policy-full-model.py')
+
+
+def abac_graph(rng):
+    # A built ABAC graph with IAMRole -> Role edges, which the generator never adds
+    users, roles, resources, policies, G = abac_dag.generate_abac_model(60, 15, 30, rng=rng.random())
+    G = abac_dag.build_abac_graph(G, roles, resources)
+    for resource, res_type in resources.items():
+        if res_type == 'IAMRole':
+            for role in rng.sample(list(roles), 2):
+                G.add_edge(resource, role)
+    return G, list(users), list(roles), [r for r, t in resources.items() if t == 'IAMRole']
+
+def policy_class_distances(G, user):
+    # A fresh descendants search, with the shortest hop count to each policy class
+    return {node: nx.shortest_path_length(G, user, node)
+            for node in nx.descendants(G, user) if G.nodes[node]['type'] == 'PolicyClass'}
+
+
+def test_abac_updates_match_a_full_detection():
+    rng = random.Random(3)
+    G, users, roles, iam_roles = abac_graph(rng)
+    detector = IncrementalABACDetector(G)
+
+    flagged = 0
+    for _ in range(200):
+        update = rng.choice(['user_role', 'resource_role', 'permissions'])
+        if update == 'permissions':
+            detector.set_role_permissions(rng.choice(roles), rng.sample(abac_dag.ALL_PERMISSIONS, rng.randint(1, 4)))
+        else:
+            u, v = (rng.choice(users), rng.choice(roles)) if update == 'user_role' else (rng.choice(iam_roles), rng.choice(roles))
+            if G.has_edge(u, v):
+                detector.remove_assignment(u, v)
+            else:
+                detector.add_assignment(u, v)
+
+        assert detector.escalation_paths == abac_dag.detect_privilege_escalation(G)[0]
+        flagged = max(flagged, len(detector.escalation_paths))
+
+    assert flagged > 0
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_ngac_updates_match_a_full_detection_through_cycles(seed):
+    rng = random.Random(seed)
+    G = ngac_dag.generate_policy_graph(20, 3, 10, 3, 4, seed=seed)[1]
+    detector = IncrementalNGACDetector(G)
+    users = [n for n, d in G.nodes(data=True) if d['type'] == 'User']
+    sources = [n for n, d in G.nodes(data=True) if d['type'] != 'PolicyClass']
+    added = []
+    was_cyclic = False
+
+    for _ in range(60):
+        if added and rng.random() < 0.4:
+            detector.remove_assignment(*added.pop(rng.randrange(len(added))))
+        else:
+            u, v = rng.sample(sources, 2)
+            if G.has_edge(u, v):
+                continue
+            detector.add_assignment(u, v)
+            added.append((u, v))
+        was_cyclic |= not detector.acyclic
+
+        assert detector.acyclic == nx.is_directed_acyclic_graph(G)
+        for user in users:
+            assert detector.reachability[user] == policy_class_distances(G, user)
+        assert detector.escalation_paths.keys() == {user for user in users if policy_class_distances(G, user)}
+
+    assert was_cyclic
@@ -0,0 +1,34 @@
+from collections import Counter
+
+import networkx as nx
+import pytest
+
+from benchmark import load_script
+from escalation_stream import iter_policy_class_escalations
+
+ngac_dag = load_script('ngac-dag-policy-full-model.py')
+
+
+@pytest.fixture(scope='module')
+def policy_graph():
+    return ngac_dag.generate_policy_graph(60, 4, 30, 4, 6, seed=13)[1]
+
+def descendant_results(G):
+    # Every (user, policy class, hop count) the descendants detector counts
+    return Counter((user, node, nx.shortest_path_length(G, user, node))
+                   for user in [n for n, d in G.nodes(data=True) if d['type'] == 'User']
+                   for node in nx.descendants(G, user) if G.nodes[node]['type'] == 'PolicyClass')
+
+
+def test_lazy_stream_yields_the_descendant_results(policy_graph):
+    assert Counter(iter_policy_class_escalations(policy_graph)) == descendant_results(policy_graph)
+
+def test_lazy_detector_matches_the_descendants_detector(policy_graph):
+    paths, path_complexity, traversal_count = ngac_dag.detect_privilege_escalation(policy_graph)
+    lazy_paths, lazy_complexity, lazy_count = ngac_dag.detect_privilege_escalation_lazy(policy_graph)
+
+    assert lazy_paths.keys() == paths.keys()
+    assert lazy_complexity == pytest.approx(path_complexity)
+    assert lazy_count == traversal_count
+    # The witness is one of the policy classes the user reaches
+    assert all(nx.has_path(policy_graph, user, witness) for user, witness in lazy_paths.items())
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import multiprocessing
+
+import networkx as nx
+import pytest
+
+from policy_server import DecisionTable, _wait_for_load, serve
+
+
+def abac_graph():
+    G = nx.DiGraph()
+    G.add_node('User_0', type='User')
+    G.add_node('User_1', type='User')
+    G.add_node('Role_0', type='Role', permissions=['iam:PassRole'])
+    G.add_node('Role_1', type='Role', permissions=['ec2:RunInstances'])
+    G.add_node('Resource_0', type='IAMRole')
+    G.add_edges_from([('User_0', 'Role_0'), ('User_1', 'Role_1'), ('Role_0', 'Resource_0'), ('Resource_0', 'Role_1')])
+    return G
+
+def ngac_graph():
+    G = nx.DiGraph()
+    for node, node_type in [('User_0', 'User'), ('User_1', 'User'), ('UA_0', 'UserAttribute'),
+                            ('iam:PassRole', 'Permission'), ('Resource_0', 'Resource'), ('IAM', 'PolicyClass')]:
+        G.add_node(node, type=node_type)
+    G.add_edges_from([('User_0', 'iam:PassRole'), ('User_0', 'UA_0'), ('iam:PassRole', 'Resource_0'),
+                      ('Resource_0', 'IAM')])
+    return G
+
+
+def test_abac_table_answers_escalation_queries():
+    table = DecisionTable(abac_graph(), 'abac')
+    witness = ('Role_0', 'Resource_0', 'Role_1')
+    assert table.answer({'user': 'User_0'}) == {'user': 'User_0', 'escalates': True, 'witness': witness}
+    assert table.answer({'user': 'User_0', 'via': 'Role_0'})['witness'] == witness
+    assert table.answer({'user': 'User_1'}) == {'user': 'User_1', 'escalates': False, 'witness': None}
+    assert 'error' in table.answer({'op': 'reach', 'user': 'User_0', 'target': 'IAM'})
+    assert 'error' in table.answer({'user': 'User_9'})
+
+def test_ngac_table_answers_reach_queries():
+    table = DecisionTable(ngac_graph(), 'ngac')
+    assert table.answer({'op': 'reach', 'user': 'User_0', 'target': 'IAM'}) == \
+        {'user': 'User_0', 'reachable': True, 'distance': 3}
+    assert table.answer({'user': 'User_0', 'via': 'iam:PassRole'})['witness'] == {'IAM': 3}
+    assert table.answer({'user': 'User_0', 'via': 'UA_0'})['escalates'] is False
+    assert table.answer({'user': 'User_1'})['escalates'] is False
+
+def test_socket_round_trip(tmp_path):
+    path = str(tmp_path / 'policy_server.sock')
+
+    async def round_trip():
+        ready = asyncio.Event()
+        server = asyncio.create_task(serve(DecisionTable(abac_graph(), 'abac'), path, ready=lambda _: ready.set()))
+        await ready.wait()
+        reader, writer = await asyncio.open_unix_connection(path)
+        lines = [{'user': 'User_0'}, [{'user': 'User_1'}, {'user': ['User_0']}, {'user': 'User_0', 'via': {}}]]
+        writer.write(b''.join(json.dumps(line).encode() + b'\n' for line in lines) + b'{not json\n')
+        await writer.drain()
+        answers = [json.loads(await reader.readline()) for _ in range(3)]
+        writer.close()
+        server.cancel()
+        return answers
+
+    single, batch, malformed = asyncio.run(round_trip())
+    assert single['escalates'] is True
+    assert batch[0] == {'user': 'User_1', 'escalates': False, 'witness': None}
+    assert 'error' in batch[1] and 'error' in batch[2]
+    assert 'error' in malformed
+
+def test_dead_server_is_reported():
+    server = multiprocessing.Process(target=int)
+    server.start()
+    server.join()
+    with pytest.raises(RuntimeError):
+        _wait_for_load(server, multiprocessing.Queue(), poll_interval=0.01)
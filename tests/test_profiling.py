@@ -0,0 +1,30 @@
+import csv
+import os
+
+from benchmark import load_script
+from profiling import PROFILE_HEADER, Profiling
+
+abac_dag = load_script('abac-dag.py')
+
+
+def test_profiled_configuration_writes_its_artifacts(tmp_path):
+    profile = Profiling(sizes=[(40, 8, 20)], top=5, sample_interval=0.0005, directory=str(tmp_path))
+    plain = abac_dag.run_configuration(40, 8, 20, seed=3)
+    profiled = abac_dag.run_configuration(40, 8, 20, seed=3, profile=profile)
+    # Profiling runs come after the timed ones, so the row's counts do not change
+    assert profiled[3] == plain[3]
+
+    files = set(os.listdir(tmp_path))
+    for phase in ['Generate', 'Build', 'Detect']:
+        assert f'40_8_20_3_{phase}.prof' in files
+        assert f'40_8_20_3_{phase}.folded' in files
+    with open(tmp_path / '40_8_20_3_hot_functions.csv', newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == PROFILE_HEADER
+    assert {row[0] for row in rows[1:]} == {'Generate', 'Build', 'Detect'}
+    assert max(int(row[1]) for row in rows[1:]) <= 5
+
+def test_unlisted_sizes_are_not_profiled(tmp_path):
+    profile = Profiling(sizes=[(40, 8, 20)], directory=str(tmp_path))
+    abac_dag.run_configuration(20, 4, 10, seed=3, profile=profile)
+    assert os.listdir(tmp_path) == []
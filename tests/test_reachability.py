@@ -0,0 +1,42 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from reachability import compute_policy_class_reachability, policy_class_cache, sparse_policy_class_distances
+
+
+@pytest.fixture
+def cyclic_graph():
+    # Two users over attribute cycles of different lengths, one attribute off every cycle
+    G = nx.DiGraph()
+    for node, node_type in [('User_0', 'User'), ('User_1', 'User'), ('UA_0', 'UserAttribute'),
+                            ('UA_1', 'UserAttribute'), ('UA_2', 'UserAttribute'), ('RA_0', 'ResourceAttribute'),
+                            ('RA_1', 'ResourceAttribute'), ('IAM', 'PolicyClass'), ('S3', 'PolicyClass')]:
+        G.add_node(node, type=node_type)
+    G.add_edges_from([('User_0', 'UA_0'), ('UA_0', 'UA_1'), ('UA_1', 'UA_0'), ('UA_1', 'RA_0'), ('RA_0', 'IAM'),
+                      ('RA_0', 'UA_0'), ('User_1', 'UA_2'), ('UA_2', 'RA_1'), ('RA_1', 'S3'), ('S3', 'RA_1'),
+                      ('UA_2', 'UA_1')])
+    return G
+
+def descendant_distances(G, node):
+    reached = nx.descendants(G, node) | {node}
+    return {n: nx.shortest_path_length(G, node, n) for n in reached if G.nodes[n]['type'] == 'PolicyClass'}
+
+
+def test_reachability_matches_descendants_on_a_cyclic_graph(cyclic_graph):
+    reachability = compute_policy_class_reachability(cyclic_graph)
+    for node in cyclic_graph:
+        assert reachability[node] == descendant_distances(cyclic_graph, node)
+
+@pytest.mark.parametrize('first', ['User_0', 'UA_1', 'RA_1'])
+def test_cache_matches_descendants_on_a_cyclic_graph(cyclic_graph, first):
+    cache = policy_class_cache(cyclic_graph)
+    assert cache.get(first) == descendant_distances(cyclic_graph, first)
+    for node in cyclic_graph:
+        assert cache.get(node) == descendant_distances(cyclic_graph, node)
+
+def test_sparse_distances_match_descendants_on_a_cyclic_graph(cyclic_graph):
+    node_names, types, policy_classes, distances = sparse_policy_class_distances(cyclic_graph)
+    for row, node in enumerate(node_names):
+        reached = np.flatnonzero(distances[row] >= 0)
+        assert {policy_classes[i]: int(distances[row, i]) for i in reached} == descendant_distances(cyclic_graph, node)
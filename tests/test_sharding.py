@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from benchmark import load_script
+from sharding import merge_shard_results, publish_graph, run_shard, run_sharded, run_sharded_nodes, shard_tasks
+
+abac_dag = load_script('abac-dag.py')
+ngac_dag = load_script('ngac-dag-policy-full-model.py')
+pam_abac = load_script('pam-abac.py')
+fn_fr = load_script('ngac-hypergraph-fn-fr.py')
+
+
+def abac_snapshot(directory):
+    # A built ABAC graph with IAMRole -> Role edges, which the generator never adds
+    rng = random.Random(5)
+    users, roles, resources, policies, G = abac_dag.generate_abac_model(90, 20, 40, rng=6)
+    G = abac_dag.build_abac_graph(G, roles, resources)
+    for resource, res_type in resources.items():
+        if res_type == 'IAMRole':
+            for role in rng.sample(list(roles), 2):
+                G.add_edge(resource, role)
+    return publish_graph(str(directory / 'abac.npz'), G), G
+
+def unsharded(snapshot, model):
+    return merge_shard_results([run_shard(task) for task in shard_tasks(snapshot, model, 1)])
+
+
+@pytest.mark.parametrize('num_shards', [2, 3, 7])
+def test_shards_merge_to_the_abac_detection(tmp_path, num_shards):
+    snapshot, G = abac_snapshot(tmp_path)
+    escalation_paths, traversal_count = abac_dag.detect_privilege_escalation(G)
+    sharded = merge_shard_results([run_shard(task) for task in shard_tasks(snapshot, 'abac', num_shards)])
+
+    assert escalation_paths
+    assert sharded[0] == escalation_paths
+    assert sharded[2] == traversal_count
+    assert sharded == unsharded(snapshot, 'abac')
+
+def test_shards_merge_to_the_ngac_detection(tmp_path):
+    model, G = ngac_dag.generate_policy_graph(50, 3, 20, 3, 5, seed=4)
+    snapshot = publish_graph(str(tmp_path / 'ngac.npz'), G)
+    escalation_paths, path_complexity, traversal_count = ngac_dag.detect_privilege_escalation_cached(G)
+    sharded = merge_shard_results([run_shard(task) for task in shard_tasks(snapshot, 'ngac', 4)])
+
+    assert sharded[:3] == (escalation_paths, pytest.approx(path_complexity), traversal_count)
+    assert sharded == unsharded(snapshot, 'ngac')
+
+def test_shards_merge_to_the_hypergraph_detection(tmp_path):
+    users, resources, permissions, policy_classes, incidence, ground_truth_paths = fn_fr.generate_ngac_incidence(
+        60, 3, 30, 3, 5, rng=2)
+    snapshot = publish_graph(str(tmp_path / 'hypergraph.npz'), incidence, policy_classes=policy_classes)
+    escalation_paths, path_complexity, traversal_count, _, _ = fn_fr.detect_privilege_escalation_sparse(
+        incidence, ground_truth_paths)
+    sharded = merge_shard_results([run_shard(task) for task in shard_tasks(snapshot, 'hypergraph', 3)])
+
+    assert sharded[:3] == (escalation_paths, path_complexity, traversal_count)
+    assert sharded == unsharded(snapshot, 'hypergraph')
+
+def test_shards_count_ground_truth_errors(tmp_path):
+    model, G = pam_abac.generate_policy_graph(120, 20, 40, seed=3)
+    snapshot = publish_graph(str(tmp_path / 'pam.npz'), G, ground_truth_paths=model['ground_truth_paths'])
+    sharded = merge_shard_results([run_shard(task) for task in shard_tasks(snapshot, 'abac', 5)])
+
+    assert sharded[0] == pam_abac.detect_privilege_escalation(G)
+    assert sharded[3:] == (0, 0)
+    assert sharded == unsharded(snapshot, 'abac')
+
+def test_pool_and_node_processes_match_in_process_shards(tmp_path):
+    snapshot, G = abac_snapshot(tmp_path)
+    expected = unsharded(snapshot, 'abac')
+    assert run_sharded(snapshot, 'abac', 3, workers=2) == expected
+    # Node results come back as JSON, with the witnesses as lists
+    escalation_paths, *counts = run_sharded_nodes(snapshot, 'abac', 2, str(tmp_path / 'nodes'))
+    assert {user: tuple(witness) for user, witness in escalation_paths.items()} == expected[0]
+    assert tuple(counts) == expected[1:]
@@ -0,0 +1,38 @@
+from benchmark import load_script
+from incidence import Incidence
+from sharding import merge_shard_results, publish_graph, run_shard, run_sharded, shard_tasks
+from shared_graph import SharedGraph, attach_graph, publish_mmap
+
+ngac_dag = load_script('ngac-dag-policy-full-model.py')
+fn_fr = load_script('ngac-hypergraph-fn-fr.py')
+
+
+def test_attached_graph_matches_the_published_one(tmp_path):
+    model, G = ngac_dag.generate_policy_graph(30, 3, 15, 3, 4, seed=6)
+    with SharedGraph(G, seed=6) as published:
+        attached_model, attached, blocks = attach_graph(published.handle)
+        assert attached_model == {'seed': 6}
+        assert list(attached.nodes(data=True)) == list(G.nodes(data=True))
+        assert list(attached.edges()) == list(G.edges())
+        assert not attached.targets.flags.writeable
+        for block in blocks:
+            block.close()
+
+    _, mapped, _ = attach_graph(publish_mmap(str(tmp_path / 'mmap'), G))
+    assert list(mapped.edges()) == list(G.edges())
+
+def test_attached_hypergraph_matches_the_published_one():
+    incidence = fn_fr.generate_ngac_incidence(30, 3, 15, 3, 4, rng=6)[4]
+    with SharedGraph(incidence) as published:
+        _, attached, blocks = attach_graph(published.handle)
+        assert isinstance(attached, Incidence)
+        assert attached.edge_names == incidence.edge_names
+        assert attached.node_ids.tolist() == incidence.node_ids.tolist()
+        for block in blocks:
+            block.close()
+
+def test_shared_shards_match_snapshot_shards(tmp_path):
+    model, G = ngac_dag.generate_policy_graph(60, 3, 20, 3, 5, seed=2)
+    snapshot = publish_graph(str(tmp_path / 'ngac.npz'), G)
+    expected = merge_shard_results([run_shard(task) for task in shard_tasks(snapshot, 'ngac', 1)])
+    assert run_sharded(snapshot, 'ngac', 3, workers=2, shared=True) == expected
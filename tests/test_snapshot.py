@@ -0,0 +1,64 @@
+import os
+
+import networkx as nx
+
+from csr_graph import CSRGraph
+from incidence import Incidence, IncidenceBuilder
+from snapshot import load_or_generate, load_snapshot, save_snapshot
+
+
+def policy_graph():
+    G = nx.DiGraph()
+    G.add_node('User_0', type='User')
+    G.add_node('Role_0', type='Role', permissions=['iam:PassRole'])
+    G.add_node('Resource_0', type='IAMRole')
+    G.add_edges_from([('User_0', 'Role_0'), ('Role_0', 'Resource_0'), ('Resource_0', 'Role_0')])
+    return G
+
+def policy_hypergraph():
+    builder = IncidenceBuilder()
+    builder.add_edge('Edge_User_0', ('User_0', 'iam:PassRole', 'Resource_0'))
+    builder.add_edge('Edge_1', ('Resource_0', 'IAM'))
+    return builder.to_incidence()
+
+
+def test_digraph_round_trip(tmp_path):
+    G = policy_graph()
+    path = save_snapshot(str(tmp_path / 'abac.npz'), G, users={'User_0': {}}, seed=1)
+
+    model, csr = load_snapshot(path)
+    assert isinstance(csr, CSRGraph)
+    assert model == {'users': {'User_0': {}}, 'seed': 1}
+    assert sorted(csr.edges()) == sorted(G.edges())
+    assert csr.nodes['Role_0'] == G.nodes['Role_0']
+
+    _, loaded = load_snapshot(path, backend='networkx')
+    assert dict(loaded.nodes(data=True)) == dict(G.nodes(data=True))
+    assert sorted(loaded.edges()) == sorted(G.edges())
+
+def test_hypergraph_round_trip(tmp_path):
+    incidence = policy_hypergraph()
+    _, loaded = load_snapshot(save_snapshot(str(tmp_path / 'hypergraph.npz'), incidence))
+
+    assert isinstance(loaded, Incidence)
+    assert loaded.edge_names == incidence.edge_names
+    assert loaded.node_names == incidence.node_names
+    assert loaded.edge_ids.tolist() == incidence.edge_ids.tolist()
+    assert loaded.node_ids.tolist() == incidence.node_ids.tolist()
+
+def test_save_leaves_no_partial_file(tmp_path):
+    save_snapshot(str(tmp_path / 'abac.npz'), policy_graph())
+    assert os.listdir(tmp_path) == ['abac.npz']
+
+def test_load_or_generate_generates_once(tmp_path):
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return {'seed': 4}, policy_graph()
+
+    load_or_generate(str(tmp_path), 'abac', (1, 1, 1), 4, generate)
+    model, G = load_or_generate(str(tmp_path), 'abac', (1, 1, 1), 4, generate)
+    assert len(calls) == 1
+    assert model == {'seed': 4}
+    assert sorted(G.edges()) == sorted(policy_graph().edges())
@@ -0,0 +1,56 @@
+import csv
+import gzip
+import random
+
+import pytest
+
+from sweep import load_row_configuration, write_sweep
+
+HEADER = ['Num_Users', 'Num_Roles', 'Value', 'Seed']
+LOG_RANGES = [(10, 2), (20, 4), (40, 8)]
+
+
+def run_configuration(num_users, num_roles, seed=None):
+    # Stand-in for a script's run_configuration: a value drawn from the job seed
+    return [num_users, num_roles, random.Random(seed).random(), seed]
+
+def read_rows(csv_file):
+    opener = gzip.open if csv_file.endswith('.gz') else open
+    with opener(csv_file, 'rt', newline='') as file:
+        return list(csv.reader(file))
+
+
+def test_same_seed_gives_same_rows(tmp_path):
+    first = write_sweep(str(tmp_path / 'first.csv'), HEADER, run_configuration, LOG_RANGES, 2, seed=11)
+    second = write_sweep(str(tmp_path / 'second.csv'), HEADER, run_configuration, LOG_RANGES, 2, seed=11)
+    assert read_rows(first) == read_rows(second)
+
+def test_workers_do_not_change_rows(tmp_path):
+    serial = write_sweep(str(tmp_path / 'serial.csv'), HEADER, run_configuration, LOG_RANGES, 2, seed=11)
+    pooled = write_sweep(str(tmp_path / 'pooled.csv'), HEADER, run_configuration, LOG_RANGES, 2, workers=2, seed=11)
+    assert read_rows(serial) == read_rows(pooled)
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_resume_finishes_an_interrupted_sweep(tmp_path, compress):
+    csv_file = str(tmp_path / 'results.csv')
+    full = read_rows(write_sweep(csv_file, HEADER, run_configuration, LOG_RANGES, 2, seed=5, compress=compress))
+
+    # Keep the header, two finished rows and a torn third line
+    path = csv_file + '.gz' if compress else csv_file
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', newline='') as file:
+        csv.writer(file).writerows(full[:3])
+        file.write('40,8,0.5')
+
+    resumed = write_sweep(csv_file, HEADER, run_configuration, LOG_RANGES, 2, seed=5, resume=True, compress=compress)
+    assert read_rows(resumed) == full
+
+def test_resume_requires_the_seed(tmp_path):
+    with pytest.raises(ValueError):
+        write_sweep(str(tmp_path / 'results.csv'), HEADER, run_configuration, LOG_RANGES, 1, resume=True)
+
+def test_row_configuration_is_read_from_gzip_results(tmp_path):
+    csv_file = write_sweep(str(tmp_path / 'results.csv'), HEADER, run_configuration, LOG_RANGES, 1, seed=3,
+                           compress=True)
+    rows = read_rows(csv_file)
+    assert load_row_configuration(csv_file, 2) == ((20, 4), int(rows[2][3]))
@@ -0,0 +1,85 @@
+import math
+import statistics
+import time
+import tracemalloc
+
+PHASES = ['Generate', 'Build', 'Detect']
+TIMING_HEADER = [f'{phase}_{column}' for phase in PHASES for column in ('Time_Median', 'Time_P95', 'Peak_Memory')]
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class PhaseTimer:
+    # Times the generate/build/detect phases of one configuration with
+    # perf_counter_ns. With runs > 1 every phase gets one untimed warm-up call
+    # before the timed runs. With trace_memory, peak memory comes from one extra
+    # run under tracemalloc so tracing never inflates the timings; it is off by
+    # default since that run costs as much as the phase itself. Likewise profiling
+    # (a profiling.ProfileSession) gets runs of its own. setup() builds fresh
+    # arguments for each call outside the timed region, for phases that mutate
+    # their input (such as adding edges to a generated graph)
+    def __init__(self, runs=1, trace_memory=False, profiler=None):
+        self.runs = runs
+        self.trace_memory = trace_memory
+        self.profiler = profiler
+        self.times = {}
+        self.peaks = {}
+
+    def measure(self, phase, fn, *args, setup=None, **kwargs):
+        def call_args():
+            return setup() if setup is not None else args
+
+        if self.runs > 1:
+            fn(*call_args(), **kwargs)
+
+        times = []
+        for _ in range(self.runs):
+            run_args = call_args()
+            start = time.perf_counter_ns()
+            result = fn(*run_args, **kwargs)
+            times.append(time.perf_counter_ns() - start)
+        self.times[phase] = times
+
+        if self.trace_memory:
+            run_args = call_args()
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(*run_args, **kwargs)
+            self.peaks[phase] = tracemalloc.get_traced_memory()[1] - baseline
+            if not was_tracing:
+                tracemalloc.stop()
+
+        if self.profiler is not None:
+            self.profiler.run(phase, fn, call_args, kwargs)
+
+        return result
+
+    def share(self, phase, other):
+        # Reports another timer's measurements of a phase, e.g. a scenario generated
+        # once for several models
+        if phase in other.times:
+            self.times[phase] = other.times[phase]
+        if phase in other.peaks:
+            self.peaks[phase] = other.peaks[phase]
+
+    def seconds(self, phase):
+        # Median of the timed runs, in seconds like the existing *_Time columns
+        if phase not in self.times:
+            return 0
+        return statistics.median(self.times[phase]) / 1e9
+
+    def columns(self):
+        row = []
+        for phase in PHASES:
+            if phase in self.times:
+                row += [self.seconds(phase), percentile(self.times[phase], 0.95) / 1e9, self.peaks.get(phase, '')]
+            else:
+                row += ['', '', '']
+        return row